@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import re
+from json.encoder import encode_basestring_ascii
+from pygments import highlight
+from pygments.token import (Name,String,Number,Keyword,Punctuation,Operator,Whitespace)
+from pygments.lexers import (JsonLexer,IniLexer)
+from pygments.formatters import Terminal256Formatter
+
+# colored text exactly as highlight(...,Terminal256Formatter()) would write
+# it, produced while walking the object instead of re-lexing its dump.
+_x_formatter = Terminal256Formatter()
+
+def _paint(ttype) :
+    while ttype :
+        if str(ttype) in _x_formatter.style_string :
+            on, off = _x_formatter.style_string[str(ttype)]
+            return lambda s : on + s + off if s else ""
+        ttype = ttype.parent
+    return lambda s : s
+
+_x_key = _paint(Name.Tag)
+_x_str = _paint(String.Double)
+_x_int = _paint(Number.Integer)
+_x_float = _paint(Number.Float)
+_x_const = _paint(Keyword.Constant)
+_x_punct = _paint(Punctuation)
+_x_space = _paint(Whitespace)
+_x_literal = dict()
+
+def _nonfinite(s) :
+    # NaN and Infinity are not json, the lexer splits them oddly
+    if s not in _x_literal :
+        _x_literal[s] = highlight(s,JsonLexer(stripnl=False,ensurenl=False),_x_formatter)
+    return _x_literal[s]
+
+def _floatstr(o) :
+    if o != o :
+        return _nonfinite("NaN")
+    if o == float("inf") :
+        return _nonfinite("Infinity")
+    if o == -float("inf") :
+        return _nonfinite("-Infinity")
+    return _x_float(float.__repr__(o))
+
+def _keystr(k) :
+    if isinstance(k,str) :
+        return k
+    if isinstance(k,float) :
+        if k != k :
+            return "NaN"
+        if k in [float("inf"),-float("inf")] :
+            return "Infinity" if k > 0 else "-Infinity"
+        return float.__repr__(k)
+    if k is True :
+        return "true"
+    if k is False :
+        return "false"
+    if k is None :
+        return "null"
+    if isinstance(k,int) :
+        return int.__repr__(k)
+    raise TypeError("keys must be str, int, float, bool or None, not {}".format(k.__class__.__name__))
+
+def _pathstr(pos) :
+    segs = list()
+    while pos :
+        pos, seg = pos
+        segs.append(seg)
+    return "_" + "".join(reversed(segs))
+
+def iterjson(obj, indent=2, sort_keys=False, batch=512, rows=None, cut=None, keyfilter=None) :
+    # same layout as json.dumps(obj,indent=indent,sort_keys=sort_keys), ends
+    # with the newline highlight() adds. yields every `batch` top level items.
+    # with `rows` lists stop after that many elements, cut(path,oldlen) is
+    # told about each one in document order. keys dropped by `keyfilter` are
+    # skipped along with everything under them.
+    if not keyfilter :
+        keyfilter = None
+    null, true, false = _x_const("null"), _x_const("true"), _x_const("false")
+    lbrace, rbrace, lbracket, rbracket = _x_punct("{"), _x_punct("}"), _x_punct("["), _x_punct("]")
+    empty = {list:_x_punct("[]"), dict:_x_punct("{}")}
+    if indent is None :
+        comma = _x_punct(",") + _x_space(" ")
+        colon = _x_punct(":") + _x_space(" ")
+        newlines = None
+    else :
+        comma = _x_punct(",")
+        colon = _x_punct(":") + _x_space(" ")
+        unit = " " * indent if isinstance(indent,int) else indent
+        newlines = ["\n"]
+    keys = dict()
+    markers = dict()
+
+    def newline(depth) :
+        while len(newlines) <= depth :
+            newlines.append("\n" + _x_space(unit * len(newlines)))
+        return newlines[depth]
+
+    def scalar(o) :
+        if isinstance(o,str) :
+            return _x_str(encode_basestring_ascii(o))
+        if o is None :
+            return null
+        if o is True :
+            return true
+        if o is False :
+            return false
+        if isinstance(o,int) :
+            return _x_int(int.__repr__(o))
+        if isinstance(o,float) :
+            return _floatstr(o)
+        return None
+
+    def key(k) :
+        # True, 1 and 1.0 hash alike, only str keys are remembered
+        if type(k) is not str :
+            return _x_key(encode_basestring_ascii(_keystr(k))) + colon
+        s = keys.get(k)
+        if s is None :
+            s = keys[k] = _x_key(encode_basestring_ascii(k)) + colon
+        return s
+
+    def walk(o, depth, out, pos=None, inside=False) :
+        s = scalar(o)
+        if s is not None :
+            out(s)
+            return
+        if isinstance(o,(list,tuple)) :
+            if not o :
+                out(empty[list])
+                return
+            items = o
+            isdict = False
+            if rows is not None and len(o) > rows :
+                if cut :
+                    cut(_pathstr(pos),len(o))
+                items = o[:rows]
+        elif isinstance(o,dict) :
+            items = o.items()
+            if keyfilter is not None and keyfilter.active(inside) :
+                items = keyfilter.items(o,inside)
+            if not items :
+                out(empty[dict])
+                return
+            if sort_keys :
+                items = sorted(items)
+            isdict = True
+        else :
+            raise TypeError("Object of type {} is not JSON serializable".format(o.__class__.__name__))
+        if id(o) in markers :
+            raise ValueError("Circular reference detected")
+        markers[id(o)] = o
+        sep = comma if newlines is None else comma + newline(depth+1)
+        out(lbrace if isdict else lbracket)
+        if newlines is not None :
+            out(newline(depth+1))
+        for i, item in enumerate(items) :
+            if i :
+                out(sep)
+            if isdict :
+                k, item = item
+                out(key(k))
+            s = scalar(item)
+            if s is not None :
+                out(s)
+            elif rows is None and keyfilter is None :
+                walk(item,depth+1,out)
+            else :
+                walk(item,depth+1,out,
+                     None if rows is None else (pos,".{}".format(k) if isdict else "[{}]".format(i)),
+                     keyfilter.child(k,inside) if isdict and keyfilter is not None else inside)
+        if newlines is not None :
+            out(newline(depth))
+        out(rbrace if isdict else rbracket)
+        del markers[id(o)]
+
+    if not isinstance(obj,(list,tuple,dict)) or not obj :
+        parts = list()
+        walk(obj,0,parts.append)
+        yield "".join(parts) + "\n"
+        return
+    isdict = isinstance(obj,dict)
+    if isdict and keyfilter is not None and keyfilter.active() :
+        items = keyfilter.items(obj)
+        if not items :
+            yield empty[dict] + "\n"
+            return
+    else :
+        items = list(obj.items() if isdict else obj)
+    if sort_keys and isdict :
+        items = sorted(items)
+    markers[id(obj)] = obj
+    if not isdict and rows is not None and len(items) > rows :
+        if cut :
+            cut("_",len(items))
+        items = items[:rows]
+    sep = comma if newlines is None else comma + newline(1)
+    head = (lbrace if isdict else lbracket) + ("" if newlines is None else newline(1))
+    for i in range(0,len(items),batch) :
+        parts = [sep if i else head]
+        out = parts.append
+        for j, item in enumerate(items[i:i+batch]) :
+            if j :
+                out(sep)
+            if isdict :
+                k, item = item
+                out(key(k))
+            if rows is None and keyfilter is None :
+                walk(item,1,out)
+            else :
+                walk(item,1,out,(None,".{}".format(k) if isdict else "[{}]".format(i+j)),
+                     keyfilter.child(k) if isdict and keyfilter is not None else False)
+        yield "".join(parts)
+    yield ("" if newlines is None else newline(0)) + (rbrace if isdict else rbracket) + "\n"
+
+# a _rawstr line the ini lexer splits into name, "=" and a value: quoted,
+# maybe with more after the closing quote which then reads as a name, or
+# bare.
+_x_iniline = re.compile(r'''([^\s;#\[=:][^=:\n]*?)=(?:(["'])([^"'\n]*)(["'])((?![ \t;#\[])[^=:\n]*)|((?![ \t"'])[^;#\\\n]*?))''')
+_x_ininame = _paint(Name.Attribute)
+_x_iniop = _paint(Operator)("=")
+_x_inistr = _paint(String)
+_x_inisep = re.compile(r"[=:][ \t]*[\"']")
+
+def _inilines(chunks, size=2**16) :
+    # lists of lines, without their \n, the way the lexer sees them: no BOM
+    # up front, \r and \r\n read as \n. small chunks are read together.
+    def batches() :
+        buf = list()
+        n = 0
+        for chunk in chunks :
+            buf.append(chunk)
+            n += len(chunk)
+            if n >= size :
+                yield "".join(buf)
+                buf = list()
+                n = 0
+        yield "".join(buf)
+    tail = ""
+    seen = False
+    for text in batches() :
+        if not seen and text :
+            seen = True
+            if text.startswith("\ufeff") :
+                text = text[1:]
+        lines = (tail + text).split("\n")
+        tail = lines.pop()
+        if "\r" in text :
+            # a \r ending a line was a \r\n
+            lines = "\n".join([ln[:-1] if ln.endswith("\r") else ln for ln in lines]).replace("\r","\n").split("\n")
+        yield lines
+    if tail :
+        yield tail.replace("\r","\n").split("\n")
+
+def _inilexed(text, lexer) :
+    # the lexer drops a BOM it finds first, which is only right at the very
+    # start of the whole text
+    if text.startswith("\ufeff") :
+        return highlight("\n" + text,lexer,_x_formatter)[1:]
+    return highlight(text,lexer,_x_formatter)
+
+def iterini(chunks) :
+    # highlight("".join(chunks),IniLexer(),Terminal256Formatter()) piece by
+    # piece. the path=value lines of _rawstr are colored here, the lexer gets
+    # runs of anything else. every line starts afresh unless one before it
+    # has a backslash, which can carry a value on to the next line. blank
+    # lines at either end are dropped as the lexer does.
+    lexer = IniLexer(stripnl=False,ensurenl=False)
+    fullmatch = _x_iniline.fullmatch
+    name, string, op = _x_ininame, _x_inistr, _x_iniop
+    pending = list()
+    carry = False
+    blanks = 0
+    started = False
+    for lines in _inilines(chunks) :
+        out = list()
+        for ln in lines :
+            if not ln :
+                blanks += started
+                continue
+            started = True
+            if blanks :
+                (pending if pending else out).append("\n" * blanks)
+                blanks = 0
+            m = None if carry else fullmatch(ln)
+            if m :
+                key, q, body, q2, rest, bare = m.groups()
+                if key[-1] in " \t" or (bare and (bare[-1] in " \t" or _x_inisep.search(bare))) :
+                    m = None
+            if m :
+                if pending :
+                    out.append(_inilexed("".join(pending),lexer))
+                    pending = list()
+                if q :
+                    out.append(name(key) + op + string(q) + string(body) + string(q2) + name(rest) + "\n")
+                else :
+                    out.append(name(key) + op + string(bare) + "\n")
+            else :
+                pending.append(ln + "\n")
+                # whitespace alone does not end a carried value
+                carry = "\\" in ln or (carry and not ln.strip())
+        if out :
+            yield "".join(out)
+    if pending :
+        yield _inilexed("".join(pending),lexer)
+    if not started :
+        yield "\n"
+
+def ini(text) :
+    return "".join(iterini([text]))
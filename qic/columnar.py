@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+from array import array
+
+
+class _Column:
+    # one column, at first as codes into its distinct values. "" is always
+    # code 0 and stands in for cells a row does not have. a column of mostly
+    # distinct strings is turned into one run of text and where each ends.
+    __slots__ = ("codes", "values", "index", "strings", "text", "chunks", "parts", "ends")
+
+    def __init__(self, n=0):
+        self.codes = array("I", bytes(4 * n))
+        self.values = [""]
+        self.index = {"": 0}
+        self.strings = True
+        self.ends = None
+
+    def append(self, v):
+        if self.ends is not None:
+            if type(v) is str:
+                self.__add(v)
+                return
+            self.__decode()
+        # True, 1 and 1.0 hash alike, other types are told apart by type.
+        # what can not be hashed is kept as is.
+        k = v if type(v) is str else (type(v), v)
+        try:
+            c = self.index.get(k)
+        except TypeError:
+            c = k = None
+        if c is None:
+            c = len(self.values)
+            self.values.append(v)
+            if k is not None:
+                self.index[k] = c
+            self.strings = self.strings and type(v) is str
+            if self.strings and c >= 4096 and c * 2 > len(self.codes):
+                self.codes.append(c)
+                self.__encode()
+                return
+        self.codes.append(c)
+
+    def get(self, i):
+        if self.ends is None:
+            return self.values[self.codes[i]]
+        if self.chunks or self.parts:
+            self.text = "".join([self.text] + self.chunks + ["".join(self.parts)])
+            self.chunks = list()
+            self.parts = list()
+        return self.text[self.ends[i]:self.ends[i + 1]]
+
+    def __add(self, v):
+        # strings are joined a few thousand at a time, not kept one by one
+        self.parts.append(v)
+        self.ends.append(self.ends[-1] + len(v))
+        if len(self.parts) >= 4096:
+            self.chunks.append("".join(self.parts))
+            self.parts = list()
+
+    def __encode(self):
+        values = self.values
+        self.ends = array("Q", [0])
+        self.text = ""
+        self.chunks = list()
+        self.parts = list()
+        for c in self.codes:
+            self.__add(values[c])
+        self.codes = self.values = self.index = None
+
+    def __decode(self):
+        cells = [self.get(i) for i in range(len(self.ends) - 1)]
+        self.__init__()
+        self.strings = False
+        for v in cells:
+            self.append(v)
+
+
+class _Row:
+    # a row read out of the columns, a sequence like the list it came from
+    __slots__ = ("_store", "_i")
+
+    def __init__(self, store, i):
+        self._store = store
+        self._i = i
+
+    def __len__(self):
+        s = self._store
+        return len(s._columns) if s._lengths is None else s._lengths[self._i]
+
+    def __getitem__(self, ix):
+        n = len(self)
+        if isinstance(ix, slice):
+            return [self[j] for j in range(*ix.indices(n))]
+        if ix < 0:
+            ix += n
+        if not 0 <= ix < n:
+            raise IndexError("row index out of range")
+        return self._store._columns[ix].get(self._i)
+
+    def __iter__(self):
+        i = self._i
+        for c in self._store._columns[:len(self)]:
+            yield c.get(i)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class ColumnStore:
+    # rows kept column by column. repeated values are stored once, strings
+    # that hardly repeat as one text. a row costs some bytes a cell plus its
+    # length. selecting columns, cutting and
+    # sorting give views that share the columns, the rows are never rebuilt.
+    def __init__(self, rows=None):
+        self._columns = list()
+        # the length of each row, None in a view of selected columns where
+        # every row is as long as the selection
+        self._lengths = array("I")
+        # row numbers in the order seen, None when that is the stored order
+        self._order = None
+        self._size = 0
+        for r in rows or list():
+            self.append(r)
+
+    def append(self, row):
+        cols = self._columns
+        while len(cols) < len(row):
+            cols.append(_Column(self._size))
+        for c, v in zip(cols, row):
+            c.append(v)
+        for c in cols[len(row):]:
+            c.append("")
+        self._lengths.append(len(row))
+        self._size += 1
+
+    def __view(self, columns, lengths, order):
+        v = ColumnStore()
+        v._columns = columns
+        v._lengths = lengths
+        v._order = order
+        v._size = self._size
+        return v
+
+    def __len__(self):
+        return self._size if self._order is None else len(self._order)
+
+    def __iter__(self):
+        order = self._order
+        for i in range(self._size) if order is None else order:
+            yield _Row(self, i)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            order = array("I", range(self._size)) if self._order is None else self._order
+            return self.__view(self._columns, self._lengths, order[pos])
+        n = len(self)
+        if pos < 0:
+            pos += n
+        if not 0 <= pos < n:
+            raise IndexError("table index out of range")
+        return _Row(self, pos if self._order is None else self._order[pos])
+
+    def select(self, xmap):
+        # only the columns at xmap, in that order. a row missing one reads "".
+        columns = [self._columns[i] if i < len(self._columns) else _Column(self._size) for i in xmap]
+        return self.__view(columns, None, self._order)
+
+    def sort(self, key=None, reverse=False):
+        # reorders the view, key gets each row as for a list of rows
+        key = key or list
+        order = range(self._size) if self._order is None else self._order
+        self._order = array("I", sorted(order, key=lambda i: key(_Row(self, i)), reverse=reverse))
@@ -7,14 +7,29 @@ import yaml
 import re
 import traceback
 import time
+import signal
 import random
 import string
 from functools import partial
 from .tblfmt import SimpleTable
 from .commandline import commandline
 from .json2table import prepare_table
-from json2html import JsonConverter
-from collections import (deque,defaultdict)
+from .jsonstream import (iter_records,leading_path,PathReader)
+from .querycache import (QueryCache,CompiledQuery)
+from .qcompile import (expand_query,key_words,QueryError)
+from .parallel import (parallel_eval,file_ranges,range_lines,line_batches)
+from .keyindex import index_of
+from .keyfilter import KeyFilter
+from .mapped import MappedFile
+from . import jsoncodec
+from . import yamlcodec
+from . import colorize
+from .termcap import supports_color
+from .outsink import OutputSink
+from .json2html import JsonConverter
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
 from types import FunctionType
 from pygments import highlight
 from pygments.lexers import (JsonLexer,YamlLexer,XmlLexer,IniLexer,HtmlLexer,guess_lexer)
@@ -30,8 +45,21 @@ print = partial(print,flush=True)
 
 DSQ_DOT="_yx_dsq_dot_yx_"
 
+class Tagged(str) :
+    # a string result that knows its format, and the data it was made from,
+    # so it can be shown without being parsed again.
+    def __new__(cls, s, fmt, data=None) :
+        obj = str.__new__(cls,s)
+        obj.fmt = fmt
+        obj.data = data
+        return obj
+
+    def __reduce__(self) :
+        # results come back from -j workers pickled
+        return (Tagged,(str(self),self.fmt,self.data))
+
 def _json(ds) :
-    return json.dumps(ds,indent=2,sort_keys=True)
+    return Tagged(jsoncodec.dumps(ds,indent=2,sort_keys=True),"json",ds)
 #def _xml(ds) :
 #    import xml.dom.minidom as dom
 #    import dicttoxml
@@ -39,23 +67,23 @@ def _json(ds) :
 #    xml = dom.parseString(xmlstr)
 #    return xml.toprettyxml()
 def _yaml(ds) :
-    return yaml.dump(ds,default_flow_style=False,explicit_start=True, explicit_end=False)
+    return Tagged(yamlcodec.dump(ds,default_flow_style=False,explicit_start=True, explicit_end=False),"yaml",ds)
 def _l(ds,brk="\n") :
     return brk.join([str(i) for i in ds])
 def _h(ds) :
-    return JsonConverter(ds).json2html()
+    return Tagged(JsonConverter(ds).json2html(),"html",ds)
 def _zh(ds) :
-    return JsonConverter(ds,recursive=True,collapseandexpand=True).json2html()
+    return Tagged(JsonConverter(ds,recursive=True,collapseandexpand=True).json2html(),"html",ds)
 def _l2t(xjson,header=None,maxcolwidth=100) :
     data,header=prepare_table(xjson,header)
     return SimpleTable(data=data,header=header,maxwidth=maxcolwidth)
 def _l2pt(xjson,header=None) :
     data,header=prepare_table(xjson,header)
-    return SimpleTable(data=data,header=header).repr_pivot()
+    return Tagged(SimpleTable(data=data,header=header).repr_pivot(),"text")
 def _t(data=list(),header=None,dataonly=False,maxcolwidth=100) :
     return SimpleTable(data=data,header=header,noheader=dataonly,maxwidth=maxcolwidth)
 def _pt(data=list(),header=None,dataonly=False) :
-    return SimpleTable(data=data,header=header,noheader=dataonly).repr_pivot()
+    return Tagged(SimpleTable(data=data,header=header,noheader=dataonly).repr_pivot(),"text")
 def _flatlist(ds,ret=None) :
     if ret is None :
         ret = list()
@@ -65,6 +93,18 @@ def _flatlist(ds,ret=None) :
     else :
         ret.append(ds)
     return ret
+def _paths(ds) :
+    data = list()
+    for st in index_of(ds).stats() :
+        types = ",".join(["{}:{}".format(t,n) for t,n in sorted(st.typenames().items())])
+        if st.minlen is None :
+            size = ""
+        elif st.minlen == st.maxlen :
+            size = str(st.minlen)
+        else :
+            size = "{}..{}".format(st.minlen,st.maxlen)
+        data.append([st.path,",".join(sorted(st.spellings)),types,st.count,size])
+    return SimpleTable(data=data,header=["path","keys","types","count","len"])
 def _qx(cmd) :
     try :
         ret,out,err = commandline.qx(cmd)
@@ -73,40 +113,60 @@ def _qx(cmd) :
             print(err)
     except :
         traceback.print_exc()
-def _rawstr(ds,last="_"):
-    res = ""
-    if type(ds) is dict :
-        for k,v in ds.items() :
+def _iterrawstr(ds,last="_") :
+    # path=value lines as they are reached. a stack of (path, items) keeps
+    # the place in every open container, deep data needs no recursion.
+    if type(ds) not in [dict,list] :
+        return
+    stack = [(last,iter(ds.items()) if type(ds) is dict else enumerate(ds),type(ds) is dict)]
+    while stack :
+        last, items, isdict = stack[-1]
+        for k, v in items :
+            path = last + "." + k if isdict else last + "[" + str(k) + "]"
             if type(v) in [dict,list] :
-                res += _rawstr(v,last+"."+k) 
-            else :
-                if type(v) is str :
-                    vstr = '"{}"'.format(v.replace('"','\\"'))
-                else :
-                    vstr = str(v)
-                res += last + "." + k +"="+ vstr  + "\n"
-    if type(ds) is list :
-        for i,v in enumerate(ds) :
-            if type(v) in [dict,list] :
-                res += _rawstr(v,last+"["+str(i)+"]") 
+                stack.append((path,iter(v.items()) if type(v) is dict else enumerate(v),type(v) is dict))
+                break
+            if isdict and type(v) is str :
+                yield path + "=" + '"{}"'.format(v.replace('"','\\"')) + "\n"
             else :
-                if type(v) is str :
-                    vstr = '"{}"'.format(v.replace('"','\"'))
-                else :
-                    vstr = str(v)
-                res += last+"["+str(i)+"]=" + str(v) + "\n"
-    return res
+                # list items have always been written unquoted
+                yield path + "=" + str(v) + "\n"
+        else :
+            stack.pop()
+
+def _rawstr(ds,last="_"):
+    return Tagged("".join(_iterrawstr(ds,last)),"ini",ds)
 
 _fl=_flatlist
 _j=_json
 #_x=_xml
 _y=_yaml
 
+def load_modules(modules,ns) :
+    import importlib
+    for m in modules.split(",")  :
+        if m :
+            m.strip()
+            if m.startswith("from ") :
+                exec(m,ns)
+            elif os.path.isfile(m) :
+                mpath = os.path.abspath(os.path.dirname(m))
+                mfile = os.path.basename(m) 
+                sys.path.append(mpath)
+                mn = mfile.replace(".py","")
+                ns[mn] = importlib.import_module(mn)
+            elif os.path.isdir(m) :
+                mpath = os.path.abspath(m) 
+                sys.path.append(m)
+            else :
+                ns[m] = importlib.import_module(m)
+
 def dsq_main():
     parser = argparse.ArgumentParser()
     parser.add_argument(dest="code", nargs='?', default="_", help="code to compile. may be a file.")
     parser.add_argument("-f", "--infile", dest="infile", help="input file")
-    parser.add_argument("-t", "--srctype", dest="srctype", default="JSON", help="JSON,YAML")
+    parser.add_argument("-t", "--srctype", dest="srctype", default="JSON", help="JSON,YAML,JSONL")
+    parser.add_argument("--lines", dest="lines", action="store_true", default=False, help="stream JSON lines/concatenated JSON records and run code per record.")
     parser.add_argument("-i", "--indent", dest="indent", default=4, help="how many spaces for indent. default 4.")
     parser.add_argument("-l", "--rows", dest="rows",type=int, default=2**30, help="use this to shrink each list included. useful for DS including too many records.")
     parser.add_argument("-o", "--output", dest="outfile",default=None,help="write as well as console. ansi color kept.")
@@ -120,6 +180,10 @@ def dsq_main():
     parser.add_argument("-p", "--plain", dest="plain", action="store_true", default=False, help="force no color code",)
     parser.add_argument("-c", "--compact", dest="compact", action="store_true", default=False, help="dump data structure in compact mode",)
     parser.add_argument("-C", "--keepcolor", dest="keepcolor", action="store_true", default=False, help="do not remove ANSI color code from input stream.",)
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=1, help="with --lines, evaluate records in this many processes. one record per line.")
+    parser.add_argument("--unordered", dest="unordered", action="store_true", default=False, help="with -j, print results as soon as any worker finishes.",)
+    parser.add_argument("--no-cache", dest="nocache", action="store_true", default=False, help="do not cache expanded/compiled code.",)
+    parser.add_argument("--json-backend", dest="jsonbackend", default="auto", help="JSON library to use : {}. default auto, the first available.".format(",".join(jsoncodec.available())))
     parser.add_argument("-X", "--debug", dest="debug", action="count", default=False, help="debug mode",)
     _x_args = parser.parse_args()
 
@@ -157,164 +221,125 @@ def dsq_main():
         strargs = "\n".join([str(v)+"="+str(getattr(_x_args,v)) for v in vars(_x_args)])
         print_err(strargs)
 
-    def supports_color():
-        plat = sys.platform
-        supported_platform = plat != 'Pocket PC' and (plat != 'win32' or 'ANSICON' in os.environ)
-        is_a_tty = hasattr(sys.stdout, 'isatty') and sys.stdout.isatty()
-        m = re.search(r"^xterm",os.environ.get("TERM","n/a"),re.IGNORECASE)
-        try :
-            ret,out,err = commandline.qx("uname -s")
-        except :
-            return False
-        iscygwin = re.search(r"cygwin",out,re.IGNORECASE)
-        return (is_a_tty or iscygwin) and (m or supported_platform)
+    try :
+        jsoncodec.use(_x_args.jsonbackend)
+    except ValueError as e :
+        print_err("# {}".format(e),lvl=2)
+        return -1
+    if _x_args.debug :
+        print_err("# json backend : {}".format(jsoncodec.current()),lvl=1)
+
     if not _x_args.plain :
-        colored = True
-        if not supports_color() :
-            colored = False
-        if os.environ.get("force_ansicolor","") in ["true","yes","y","1"] :
-            colored = True
-        _x_args.plain = colored
-    if _x_args.keys_included :
-        _xdt_keys_included = dict()
-        for w in  _x_args.keys_included.split(",") :
-            recursive = 0
-            if re.search(r"(\*|\/|\+)+$",w) :
-                recursive = 1
-                w = re.sub(r"(\*|\/|\+)+$","",w)
-            if w :
-                _xdt_keys_included[w.lower()] = recursive
-    else :
-        _xdt_keys_included = None
-    if _x_args.keys_excluded :
-        _xset_keys_excluded = set([w.lower() for w in _x_args.keys_excluded.split(",") if w])
-    else :
-        _xset_keys_excluded = None
+        _x_args.plain = not supports_color()
+    _x_out = OutputSink(_x_args.outfile)
+    # -K/-E, applied while the result is written out
+    _x_keyfilter = KeyFilter(_x_args.keys_included,_x_args.keys_excluded)
 
-    def cutkeys_helper(ds,inkeys,outkeys) :
-        if not inkeys and not outkeys :
-            return ds
-        if type(ds) is dict :
-            ds = {k:v for k, v in ds.items() if (not inkeys or k.lower() in inkeys) and (not outkeys or k.lower() not in outkeys)}
-            for k,v in ds.items() :
-                if not inkeys or (inkeys and k.lower() in inkeys and inkeys[k.lower()] != 1) :
-                    ds[k] = cutkeys_helper(v,inkeys,outkeys)
-        if type(ds) is list :
-            for i,v in enumerate(ds) :
-                if type(v) in [dict,list] :
-                    ds[i] = cutkeys_helper(v,inkeys,outkeys)
-        return ds
-    def cutkeys(ds,inkeys=_xdt_keys_included,outkeys=_xset_keys_excluded) :
-        ds = cutkeys_helper(ds,inkeys,outkeys)
-        if _xset_keys_excluded :
-            ds = cutkeys_helper(ds,inkeys=dict(),outkeys=outkeys)
-        return ds
+    def notice_rows(pos,oldlen) :
+        print_err("# {}[] {} -> {}".format(pos,oldlen,_x_args.rows),lvl=1)
 
     def shrink_list(ds,pos="_") :
+        # only lists past -l and the containers holding them are copied, the
+        # data itself is left alone.
+        if _x_args.rows == 2**30 :
+            return ds
         if type(ds) is dict :
+            res = None
             for k,v in ds.items() :
                 if type(v) in [dict,list] :
-                    ds[k] = shrink_list(v,pos+".{}".format(k))
+                    nv = shrink_list(v,pos+".{}".format(k))
+                    if nv is not v :
+                        if res is None :
+                            res = dict(ds)
+                        res[k] = nv
+            return ds if res is None else res
         if type(ds) is list :
             oldlen = len(ds)
             if _x_args.rows < oldlen :
-                print_err("# {}[] {} -> {}".format(pos,oldlen,_x_args.rows),lvl=1)
-            ds = ds[:_x_args.rows]
+                notice_rows(pos,oldlen)
+                ds = ds[:_x_args.rows]
+            res = None
             for i, v in enumerate(ds) :
                 if type(v) in [dict,list] :
-                    ds[i] = shrink_list(v,pos+"[{}]".format(i))
+                    nv = shrink_list(v,pos+"[{}]".format(i))
+                    if nv is not v :
+                        if res is None :
+                            res = list(ds)
+                        res[i] = nv
+            return ds if res is None else res
         return ds
 
-    def collect_keys(ds, dt) :
-        if type(ds) is dict :
-            for k, v in ds.items() :
-                dt[k.lower()].add(k)
-                collect_keys(v,dt)
-        elif type(ds) in [list,tuple] :
-            for i in ds :
-                collect_keys(i,dt)
-        else :
-            pass
+    _x_lexers = {"json":JsonLexer,"yaml":YamlLexer,"html":HtmlLexer,"ini":IniLexer}
+    def sniff(res) :
+        # one look at the edges of an untagged string. one that looks like
+        # json is parsed to be sure, str(_) of a dict looks alike.
+        head = res[:64].lstrip()
+        tail = res[-64:].rstrip()
+        if head[:1] in ["{","["] and tail[-1:] in ["}","]"] :
+            try :
+                jsoncodec.loads(res)
+                return "json"
+            except ValueError :
+                pass
+        if head.startswith("---") :
+            return "yaml"
+        if "<" in res or "&" in res :
+            return "html"
+        return "text"
 
     def show_result(res) :
-        def print_tee(s) :
-            if _x_args.outfile :
-                with open(_x_args.outfile,"a") as fw :
-                    fw.write(s)
-            print(s)
-        if _x_args.outfile :
-            with open(_x_args.outfile,"w") as fw :
-                pass
-            xprint = print_tee
-        else :
-            xprint = print
+        xprint = _x_out.print
+        if not _x_args.lines :
+            _x_out.truncate()
 
         if not res :
            return
-        if type(res) is str :
+        if isinstance(res,SimpleTable) :
+            _x_out.stream(ln + "\n" for ln in res.iter_lines())
+            return
+        rows = None if _x_args.rows == 2**30 else _x_args.rows
+        if isinstance(res,str) :
             if _x_args.plain :
                 xprint(res) 
                 return
-            try :
-                if _x_args.rawstr :
-                    xprint(highlight(res,IniLexer(),Terminal256Formatter()))
-                    return
-            except :
-                pass
-            try :
-                xprint(highlight(res,HtmlLexer(),Terminal256Formatter()))
+            fmt = getattr(res,"fmt",None) or sniff(res)
+            if _x_args.rawstr :
+                fmt = "ini"
+            if fmt == "json" and getattr(res,"data",None) is not None :
+                _x_out.stream(colorize.iterjson(res.data,indent=2,sort_keys=True,rows=rows,cut=notice_rows))
                 return
-            except :
-                pass
-            try :
-                json.loads(res)
-                if _x_args.rows != 2**30 :
-                    res = json.loads(res)
-                    res = shrink_list(res)
-                    res = json.dumps(res,indent=2,sort_keys=True)
-                xprint(highlight(res,JsonLexer(),Terminal256Formatter()))
+            if fmt == "yaml" and rows is not None and getattr(res,"data",None) is not None :
+                res = _yaml(shrink_list(res.data))
+            if fmt == "ini" :
+                xprint(colorize.ini(res))
                 return
-            except :
-                pass
-            try :
-                yaml.safe_load(res)
-                if _x_args.rows != 2**30 :
-                    res = yaml.safe_load(res)
-                    res = shrink_list(res)
-                    res = yaml.dump(res,default_flow_style=False,explicit_start=True, explicit_end=False)
-                xprint(highlight(res,YamlLexer(),Terminal256Formatter()))
+            if fmt == "text" :
+                # what HtmlLexer makes of text without markup
+                if res.startswith("\ufeff") :
+                    res = res[1:]
+                xprint(res.replace("\r\n","\n").replace("\r","\n").strip("\n") + "\n")
                 return
-            except :
-                pass
-            #try :
-            #    xmltodict.parse(res)
-            #    xprint(highlight(res,XmlLexer(),Terminal256Formatter()))
-            #    return
-            #except :
-            #    pass
-            xprint(highlight(res,guess_lexer(res),Terminal256Formatter()))
+            xprint(highlight(res,_x_lexers[fmt](),Terminal256Formatter()))
         else :
-            res = cutkeys(res)
-            res = shrink_list(res)
             if _x_args.rawstr :
-                if _x_args.plain :
-                    xprint(_rawstr(res))
-                else :
-                    xprint(highlight(_rawstr(res),IniLexer(),Terminal256Formatter()))
+                # lines go out as they are made, for -s | grep
+                lines = _iterrawstr(shrink_list(_x_keyfilter.apply(res)))
+                _x_out.stream(lines if _x_args.plain else colorize.iterini(lines))
             else :
                 try :
                     if _x_args.plain :
-                        if _x_args.compact :
-                            xprint(json.dumps(res))
-                        else :
-                            xprint(json.dumps(res,indent=2))
+                        chunks = jsoncodec.iterdumps(shrink_list(_x_keyfilter.apply(res)),indent=None if _x_args.compact else 2)
                     else :
-                        if _x_args.compact :
-                            xprint(highlight(json.dumps(res),JsonLexer(),Terminal256Formatter()))
-                        else :
-                            xprint(highlight(json.dumps(res,indent=2),JsonLexer(),Terminal256Formatter()))
+                        # the serializer applies -l, -K and -E itself, nothing is copied
+                        chunks = colorize.iterjson(res,indent=None if _x_args.compact else 2,
+                                                   rows=rows,cut=notice_rows,keyfilter=_x_keyfilter)
+                    _x_out.stream(chunks)
                 except :
-                    xprint(str(res))
+                    if _x_out.written :
+                        _x_out.print()
+                        print_err("# {}".format(traceback.format_exc().splitlines()[-1]),lvl=2)
+                    else :
+                        xprint(str(res))
 
     def removespaces(code) :
         if not code or "{" not in code or "}" not in code :
@@ -449,47 +474,89 @@ def dsq_main():
             print("# [ dot  ] after  = ",res)
         return res
 
-    def runcode(code,data=None) :
-        _ = data
-        if not code :
-            return
+    def keyword_notice(w,nw) :
+        if _x_args.debug :
+            print_err("# keyword replcement : {} -> {}".format(w,nw),lvl=1)
+
+    def usedkeys(code) :
+        # spellings of just the keys the code may use, the document is not
+        # walked for a query without any .key
+        if _x_args.origin :
+            return dict()
+        return _x_keys.spellings(key_words(code))
+
+    def expandcode(code) :
         if not _x_args.origin :
             code = code.replace("\\n","\n")
-            code = removespaces(code)
-            code,passbook = log_special(code)
-            code = listexpand(code)
-            code = choiceexpand(code)
-            code = dotexpand(code,_x_key_dict)
-            code = code.replace(DSQ_DOT,".")
-            if passbook :
-                for k,v in passbook.items() :
-                    code = code.replace(k,v)
+            try :
+                xcode = expand_query(code,usedkeys(code),globals(),notify=keyword_notice)
+                if _x_args.debug > 2:
+                    print("# [ ast  ] before = ",code)
+                    print("# [ ast  ] after  = ",xcode)
+                code = xcode
+            except QueryError as e :
+                if _x_args.debug > 2:
+                    print("# [ ast  ] {}, falling back to regex expansion".format(e))
+                code = legacy_expand(code)
         if _x_args.debug:
             print_err("# run : ",lvl=1)
             print_err(code)
+        return code
+
+    def legacy_expand(code) :
+        code = removespaces(code)
+        code,passbook = log_special(code)
+        code = listexpand(code)
+        code = choiceexpand(code)
+        code = dotexpand(code,usedkeys(code))
+        code = code.replace(DSQ_DOT,".")
+        if passbook :
+            for k,v in passbook.items() :
+                code = code.replace(k,v)
+        return code
+
+    def compilecode(code) :
+        key = None
+        if _x_cache :
+            key = QueryCache.makekey(code,usedkeys(code),_x_args.origin,_x_args.modules)
+            q = _x_cache.get(key)
+            if q :
+                if _x_args.debug:
+                    print_err("# run (cached) : ",lvl=1)
+                    print_err(q.code)
+                return q
+        xcode = expandcode(code)
+        evaluable = not (re.search("^\w+\s*=\S+",xcode) or len(xcode.splitlines())>1 or re.search(r"^(for|while)\s+",xcode))
+        q = CompiledQuery.build(xcode,evaluable)
+        if _x_cache :
+            _x_cache.put(key,q)
+        return q
+
+    def evalcode(q,data=None) :
+        _ = data
         attempts=0 
         err=""
         while True :
             try :
                 if attempts == 0 :
-                    if re.search("^\w+\s*=\S+",code) or len(code.splitlines())>1 or re.search(r"^(for|while)\s+",code) :
+                    if q.evalobj is None :
                         attempts += 1
                         continue
                     if _x_args.debug >= 2:
                         print_err("# eval : ",lvl=1)
-                        print_err(code)
-                    res = eval(code)
+                        print_err(q.code)
+                    res = eval(q.evalobj)
                     show_result(res)
                     return
                 elif attempts == 1 :
                     if _x_args.debug >= 2:
                         print_err("# exec :",lvl=1)
-                        print_err(code)
-                    exec(code)
+                        print_err(q.code)
+                    exec(q.execobj or q.code)
                     return
                 else :
                     print_err("# expanded code :",lvl=2)
-                    print_err("{}".format(code),lvl=2)
+                    print_err("{}".format(q.code),lvl=2)
                     print_err("# {}".format(err.splitlines()[-1]),lvl=2)
                     #if _x_args.debug :
                     #    print_err(err,lvl=2)
@@ -499,16 +566,61 @@ def dsq_main():
                 attempts += 1
                 continue
 
+    def runcode(code,data=None) :
+        if not code :
+            return
+        evalcode(compilecode(code),data)
+
+    if _x_args.srctype.upper() in ["JSONL","NDJSON"] :
+        _x_args.srctype = "JSON"
+        _x_args.lines = True
+    if _x_args.lines and _x_args.interactive :
+        print_err("# --lines is not supported in interactive mode.",lvl=2)
+        return -1
+
+    _x_path = None
+    _x_head = None
+    if _x_args.srctype.upper() == "JSON" and not (_x_args.lines or _x_args.interactive or _x_args.func or _x_args.origin) \
+       and not os.path.isfile(_x_args.code) and not re.search(r"\breturn\b",_x_args.code) :
+        _x_path = leading_path(_x_args.code)
+        if _x_args.rows != 2**30 and not _x_keyfilter.active() and leading_path(_x_args.code,whole=True) is not None :
+            # the query only picks a value, its lists need no more than -l
+            # elements read. -K/-E may drop some of them, -l then waits
+            # for the filter as it would for any result.
+            _x_path = leading_path(_x_args.code,whole=True)
+            _x_head = _x_args.rows
+        if _x_args.debug and _x_path is not None :
+            print_err("# targeted parse : {}".format(_x_path),lvl=1)
+
+    def input_chunks(chunks,stripansi=True) :
+        tail = ""
+        for chunk in chunks :
+            try :
+                signal.alarm(0)
+            except :
+                pass
+            if _x_args.keepcolor or not stripansi :
+                yield chunk
+                continue
+            chunk = tail + chunk
+            tail = ""
+            ix = max(chunk.rfind("\x1b",-16),chunk.rfind("\x9b",-16))
+            if ix >= 0 :
+                chunk, tail = chunk[:ix], chunk[ix:]
+            yield re.sub(r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]',"",chunk)
+        if tail :
+            yield re.sub(r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]',"",tail)
+
     INPUT = None
-    if _x_args.infile:
+    if _x_args.lines or _x_path is not None :
+        pass
+    elif _x_args.infile:
         if not os.path.isfile(_x_args.infile):
             print_err("# {} not exists.".format(_x_args.infile),lvl=2)
-        with open(_x_args.infile, "r") as f:
-            INPUT = f.read()
-            INPUT = INPUT.strip()
-    else : 
+        with MappedFile(_x_args.infile) as mf :
+            INPUT = mf.text(stripansi=not _x_args.keepcolor)
+    if not _x_args.infile :
         if not _x_args.interactive :
-            import signal
             TIMEOUT = 10
             def interrupted(signal, frame):
                 print("# timeout/no input from STDIN detected.",
@@ -522,9 +634,10 @@ def dsq_main():
                 signal.alarm(TIMEOUT)
             except :
                 pass
-            INPUT = sys.stdin.read()
-            signal.alarm(0)
-            INPUT = INPUT.strip()
+            if not (_x_args.lines or _x_path is not None) :
+                INPUT = sys.stdin.read()
+                signal.alarm(0)
+                INPUT = INPUT.strip()
     if not INPUT :
         INPUT = json.dumps({})
 
@@ -532,57 +645,59 @@ def dsq_main():
         print_err("# INPUT :",lvl=1)
         print_err(INPUT)
 
-    if not _x_args.keepcolor :
+    if not _x_args.keepcolor and not _x_args.infile :
         INPUT = re.sub(r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]',"",INPUT)
 
 
     try :
-       if _x_args.srctype.upper() == "JSON" :
-            _ = json.loads(INPUT)
+       if _x_args.lines :
+            _ = dict()
+       elif _x_path is not None :
+            if _x_args.infile :
+                with MappedFile(_x_args.infile) as mf :
+                    _ = PathReader(input_chunks(mf.chunks(),mf.has_ansi())).select(_x_path,rows=_x_head,cut=notice_rows)
+            else :
+                _ = PathReader(input_chunks(iter(partial(sys.stdin.read,2**20),""))).select(_x_path,rows=_x_head,cut=notice_rows)
+       elif _x_args.srctype.upper() == "JSON" :
+            _ = jsoncodec.loads(INPUT)
        elif _x_args.srctype.upper() == "YAML" :
-            _ = yaml.safe_load(INPUT)
+            _ = yamlcodec.safe_load(INPUT)
        #elif _x_args.srctype.upper() == "XML" :
        #     _ = xmltodict.parse(INPUT)
        else :
         print_err("# unsupported file type.",lvl=2)
         return -1
+    except yaml.composer.ComposerError as e :
+        if e.context == "expected a single document in the stream" :
+            print_err("# {}".format(str(e).splitlines()[0]),lvl=2)
+            print_err("# multiple YAML documents found, use --lines to run the code per document.",lvl=2)
+        else :
+            print_err("# invalid JSON/YAML/XML.",lvl=2)
+            traceback.print_exc()
+        return -1
     except :
         print_err("# invalid JSON/YAML/XML.",lvl=2)
         traceback.print_exc()
         return -1
+    INPUT = None
 
     if _x_args.debug >= 2 :
         print_err("# data loaded :",lvl=1)
         print_err(json.dumps(_,indent=2))
 
-    _x_key_dict = defaultdict(set)
-    collect_keys(_,dt=_x_key_dict)
+    _x_keys = index_of(_)
     if _x_args.debug >= 2 :
-        print_err("# keys collected : {}".format(str(_x_key_dict)),lvl=1)
-    keys_extra= "_,_t,_x,_y,_j,_l,_tbl,_l2t,_l2pt,_pt,_qx,_rawstr,_flatlist,_fl".split(",")
-    _x_word_completer = WordCompleter(sorted(list(set([x for x in _x_key_dict.keys()]+keys_extra))))
+        print_err("# keys collected : {}".format(str(_x_keys.spellings())),lvl=1)
+    _x_cache = None
+    if not _x_args.nocache :
+        _x_cache = QueryCache(cachedir=None if _x_args.interactive else QueryCache.default_dir())
+    keys_extra= "_,_t,_x,_y,_j,_l,_tbl,_l2t,_l2pt,_pt,_qx,_rawstr,_flatlist,_fl,_paths".split(",")
+    _x_word_completer = WordCompleter(lambda : sorted(list(set(_x_keys.keys()+keys_extra))))
         
     if _x_args.modules :
         _x_args.modules = os.path.expanduser(_x_args.modules)
         _x_args.modules = os.path.expandvars(_x_args.modules)
-        for m in _x_args.modules.split(",")  :
-            if m :
-                m.strip()
-                if m.startswith("from ") :
-                    exec(m)
-                elif os.path.isfile(m) :
-                    mpath = os.path.abspath(os.path.dirname(m))
-                    mfile = os.path.basename(m) 
-                    sys.path.append(mpath)
-                    mn = mfile.replace(".py","")
-                    import importlib
-                    globals()[mn] = importlib.import_module(mn)
-                elif os.path.isdir(m) :
-                    mpath = os.path.abspath(m) 
-                    sys.path.append(m)
-                else :
-                    import importlib
-                    globals()[m] = importlib.import_module(m)
+        load_modules(_x_args.modules,globals())
 
     def run_as_func(code,_=_) :
         fname = "".join([random.choice(string.ascii_letters) for _ in range(20)])
@@ -602,7 +717,7 @@ def dsq_main():
             newcode += " "*(int(_x_args.indent)) + ln + "\n"
         code = listexpand(newcode)
         code = choiceexpand(newcode)
-        code = dotexpand(newcode,_x_key_dict)
+        code = dotexpand(newcode,usedkeys(newcode))
         code = code.replace(DSQ_DOT,".")
         if _x_args.debug :
             print_err("# code to compile : ",lvl=1)
@@ -619,6 +734,89 @@ def dsq_main():
         xfunc = FunctionType(cobj, globals())
         print(xfunc(_))
 
+    def input_lines(lines) :
+        if _x_args.keepcolor :
+            return lines
+        return (re.sub(r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]',"",ln) for ln in lines)
+
+    def run_parallel(code) :
+        if _x_args.infile :
+            with open(_x_args.infile,"r") as fr :
+                first = next(iter_records(input_lines(fr)),None)
+            tasks = file_ranges(_x_args.infile,_x_args.jobs)
+        else :
+            batches = line_batches(sys.stdin)
+            head = next(batches,list())
+            try :
+                signal.alarm(0)
+            except :
+                pass
+            first = next(iter_records(input_lines(head)),None)
+            tasks = chain([head],batches)
+        if first is None :
+            return
+        _x_keys.add(first)
+        q = compilecode(code)
+        if q.evalobj is None :
+            print_err("# -j only runs expressions, using one process.",lvl=2)
+            for t in tasks :
+                for rec in iter_records(input_lines(range_lines(*t) if type(t) is tuple else t)) :
+                    evalcode(q,data=rec)
+            return
+        try :
+            for ok, res in parallel_eval(q.code,tasks,_x_args.jobs,_x_args.modules,_x_args.keepcolor,ordered=not _x_args.unordered) :
+                if ok :
+                    show_result(res)
+                else :
+                    print_err("# expanded code :",lvl=2)
+                    print_err("{}".format(q.code),lvl=2)
+                    print_err("# {}".format(res),lvl=2)
+        except BrokenProcessPool as e :
+            raise ValueError("-j worker processes failed, {}".format(str(e).rstrip(".")))
+
+    def run_lines(code) :
+        yamldocs = _x_args.srctype.upper() == "YAML"
+        if _x_args.srctype.upper() != "JSON" and not yamldocs :
+            print_err("# --lines only supports JSON records and YAML documents.",lvl=2)
+            return -1
+        if _x_args.jobs > 1 and yamldocs :
+            print_err("# -j is not supported for YAML documents, using one process.",lvl=2)
+        elif _x_args.jobs > 1 and not _x_args.func :
+            try :
+                run_parallel(code)
+            except ValueError as e :
+                print_err("# {}".format(e),lvl=2)
+                return -1
+            return 0
+        if _x_args.infile :
+            fr = open(_x_args.infile,"r")
+        else :
+            fr = sys.stdin
+        lines = input_lines(fr)
+        xcode = None
+        try :
+            for rec in (yamlcodec.safe_load_all(lines) if yamldocs else iter_records(lines)) :
+                if rec is None :
+                    continue
+                if xcode is None :
+                    try :
+                        signal.alarm(0)
+                    except :
+                        pass
+                    _x_keys.add(rec)
+                    xcode = code if _x_args.func else compilecode(code)
+                if _x_args.func :
+                    run_as_func(xcode,rec)
+                else :
+                    evalcode(xcode,data=rec)
+        except (ValueError,yaml.YAMLError) as e :
+            print_err("# {}".format(e),lvl=2)
+            return -1
+        finally :
+            if fr is not sys.stdin :
+                fr.close()
+        return 0
+
     if os.path.isfile(_x_args.code) :
         code = open(_x_args.code,"r").read()
     else :
@@ -632,6 +830,9 @@ def dsq_main():
        or any([re.match(r"^\s*return.*",ln) for ln in xcode.split(";")])  :
         _x_args.func = True
 
+    if _x_args.lines :
+        return run_lines(code)
+
     if _x_args.code and not _x_args.func :
         if not (_x_args.interactive and _x_args.code == "_") :
             runcode(code,data=_)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import re
+import heapq
+import pickle
+import tempfile
+from collections import deque
+from itertools import islice
+
+_x_number = re.compile(r"^\d+(\.\d*)*$")
+
+
+def numeric_key(cols):
+    # the -s order: for each column a number when the cell reads as one, 0
+    # otherwise, then the cell text
+    def key(x):
+        v = list()
+        for i in cols:
+            v0 = x[i]
+            if type(v0) is not str:
+                v0 = "" if v0 is None else str(v0)
+            if _x_number.match(v0):
+                v.append(float(v0))
+            else:
+                v.append(0)
+            v.append(v0)
+        return v
+    return key
+
+
+def top(rows, n, key=None):
+    # sorted(rows,key=key,reverse=True)[:n] keeping only n rows at a time.
+    # without a key the first n rows.
+    if key is None:
+        return list(islice(rows, max(n, 0)))
+    return heapq.nlargest(n, rows, key=key)
+
+
+def bottom(rows, n, key=None):
+    # sorted(rows,key=key)[:n] keeping only n rows at a time. without a key
+    # the last n rows.
+    if key is None:
+        return list(deque(rows, maxlen=max(n, 0)))
+    return heapq.nsmallest(n, rows, key=key)
+
+
+def rowsize(row):
+    # about what a list of short ascii strings takes in memory
+    return 56 + sum([57 + len(c) for c in row])
+
+
+def _spill(rows, batch=4096):
+    f = tempfile.TemporaryFile()
+    it = iter(rows)
+    while True:
+        part = list(islice(it, batch))
+        if not part:
+            break
+        pickle.dump(part, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return f
+
+
+def _read(f):
+    f.seek(0)
+    while True:
+        try:
+            part = pickle.load(f)
+        except EOFError:
+            return
+        yield from part
+
+
+class Merged:
+    # sorted runs on disk, merged again on every pass over them. one pass
+    # at a time, the runs are read in place.
+    def __init__(self, runs, key=None):
+        self.__runs = runs
+        self.__key = key
+
+    def __iter__(self):
+        return heapq.merge(*[_read(f) for f in self.__runs], key=self.__key)
+
+    def close(self):
+        for f in self.__runs:
+            f.close()
+        self.__runs = list()
+
+
+def _merge(runs, key):
+    m = Merged(runs, key)
+    f = _spill(m)
+    m.close()
+    return f
+
+
+def sort(rows, key=None, limit=2**28, size=rowsize, fanin=64):
+    # sorted(rows,key=key), as a list when it fits in about `limit` bytes.
+    # past that every `limit` bytes are sorted and written to a temporary
+    # file, and a Merged over the runs is returned. the merge keeps the order
+    # of equal rows, so the result is the same as sorting in one go. no more
+    # than `fanin` runs are open at a time, they are merged into one as that
+    # many pile up.
+    runs = list()
+    buf = list()
+    used = 0
+    for r in rows:
+        buf.append(r)
+        used += size(r)
+        if used >= limit:
+            buf.sort(key=key)
+            if len(runs) + 1 >= fanin:
+                runs = [_merge(runs, key)]
+            runs.append(_spill(buf))
+            buf = list()
+            used = 0
+    buf.sort(key=key)
+    if not runs:
+        return buf
+    if buf:
+        if len(runs) + 1 > fanin:
+            runs = [_merge(runs, key)]
+        runs.append(_spill(buf))
+    return Merged(runs, key)
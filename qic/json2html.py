@@ -5,10 +5,10 @@ import sys
 import argparse
 import os
 import re
-import json
-import yaml
 import random
 import string
+from . import jsoncodec
+from . import yamlcodec
 
 def jsonize(p,depth=9999,keyset=None,explainlist=True) :
     if depth <= 0 :
@@ -18,7 +18,7 @@ def jsonize(p,depth=9999,keyset=None,explainlist=True) :
             if type(c) is str :
                 if (keyset and k in keyset) or (not keyset) :
                     try :
-                        p[k] = jsonize(json.loads(c),depth=depth-1,keyset=keyset,explainlist=explainlist)
+                        p[k] = jsonize(jsoncodec.loads(c),depth=depth-1,keyset=keyset,explainlist=explainlist)
                     except :
                         pass
             else :
@@ -28,7 +28,7 @@ def jsonize(p,depth=9999,keyset=None,explainlist=True) :
             if type(k) is str :
                 if explainlist :
                     try :
-                        p[i] = jsonize(json.loads(k),depth=depth-1,keyset=keyset,explainlist=explainlist)
+                        p[i] = jsonize(jsoncodec.loads(k),depth=depth-1,keyset=keyset,explainlist=explainlist)
                     except :
                         pass
             else :
@@ -37,7 +37,7 @@ def jsonize(p,depth=9999,keyset=None,explainlist=True) :
         p = jsonize(list(p))
     elif type(p) is str :
         try :
-            p = jsonize(json.loads(p),depth=depth-1,keyset=keyset,explainlist=explainlist)
+            p = jsonize(jsoncodec.loads(p),depth=depth-1,keyset=keyset,explainlist=explainlist)
         except :
             pass
     else :
@@ -66,7 +66,7 @@ class JsonConverter:
             self.__obj = jsstr
         else:
             try:
-                self.__obj = json.loads(jsstr)
+                self.__obj = jsoncodec.loads(jsstr)
             except:
                 print("# invalid JSON.")
                 sys.exit(0)
@@ -101,7 +101,7 @@ class JsonConverter:
         self.__collapseandexpand = collapseandexpand
 
     def json2html(self):
-        return self.json2html_helper(self.__obj)
+        return "".join(self.iter_html())
 
     def __is_final_list(self, lst):
         if not type(lst) is list:
@@ -128,11 +128,47 @@ class JsonConverter:
         return True
 
     def json2yaml(self):
-        return yaml.safe_dump(self.__obj, default_flow_style=False)
+        return yamlcodec.safe_dump(self.__obj, default_flow_style=False)
 
 
+    def iter_html(self, size=2**16):
+        # the html in chunks of about `size` characters
+        return self.__chunks(self.__obj, 0, size)
+
+    def write(self, fp=None):
+        fp = fp or sys.stdout
+        for chunk in self.iter_html():
+            fp.write(chunk)
+
     def json2html_helper(self, obj, lvl=0):
-        out = ""
+        return "".join(self.__chunks(obj, lvl))
+
+    def __chunks(self, obj, lvl, size=2**16):
+        # containers are walked with a stack of generators, one per open
+        # table, so neither depth nor length builds up anything but the
+        # pending chunk
+        stack = [self.__walk(obj, lvl)]
+        parts = list()
+        pending = 0
+        while stack:
+            for item in stack[-1]:
+                if type(item) is tuple:
+                    stack.append(self.__walk(*item))
+                    break
+                parts.append(item)
+                pending += len(item)
+                if pending >= size:
+                    yield "".join(parts)
+                    parts = list()
+                    pending = 0
+            else:
+                stack.pop()
+        if parts:
+            yield "".join(parts)
+
+    def __walk(self, obj, lvl):
+        # the markup of one value, a tuple (value, lvl) stands for a nested
+        # one the caller walks in its place
         inlist_border = 1
         ctoggle = '+/-'
         jqyhdr = """
@@ -151,19 +187,20 @@ class JsonConverter:
         curshift = " " * 4 * lvl
         if lvl == 0 :
             if self.__collapseandexpand :
-                out += jqyhdr
-            out += "\n<tt>\n" 
+                yield jqyhdr
+            yield "\n<tt>\n"
 
         if type(obj) is not list and type(obj) is not dict:
             if self.__recursive:
                 try:
-                    o = json.loads(obj)
-                    out += self.json2html_helper(o,lvl+1)
+                    o = jsoncodec.loads(obj)
                 except:
-                    out += curshift + str(obj)
+                    yield curshift + str(obj)
+                    return
+                yield (o, lvl+1)
             else:
-                out += curshift + str(obj)
-            return out
+                yield curshift + str(obj)
+            return
         if self.__colors:
             c = self.__colors[self.__lastcolor]
             self.__lastcolor = (self.__lastcolor + 1) % len(self.__colors)
@@ -179,13 +216,13 @@ class JsonConverter:
                 for r in obj:
                     r = str(r).replace("\r\n", "<br>")
                     r = str(r).replace("\n", "<br>")
-                    out += curshift + "<li>" + str(r) + "</li>\n"
+                    yield curshift + "<li>" + str(r) + "</li>\n"
             elif self.__is_final_tbl(obj):
                 tid = "".join([random.choice(string.ascii_letters) for _ in range(20)])
                 tw = 'width="100%"' if lvl != 0 else ""
-                out += curshift + "<table {} border={} {}>\n".format(style, inlist_border,tw)
+                yield curshift + "<table {} border={} {}>\n".format(style, inlist_border,tw)
                 if self.__collapseandexpand :
-                    out += curshift + """<tr class="parent" id="{}" title="Click to expand/collapse" style="cursor: pointer;"> <td bgcolor="#FFFFCC">L({})</td> </tr>\n""".format(tid,len(obj))
+                    yield curshift + """<tr class="parent" id="{}" title="Click to expand/collapse" style="cursor: pointer;"> <td bgcolor="#FFFFCC">L({})</td> </tr>\n""".format(tid,len(obj))
                 need_switch = len(obj) > 1
                 colors = ["#FFFFFF", "F8F8F8"]
                 ix = 0
@@ -199,30 +236,28 @@ class JsonConverter:
                             v = str(v).replace("\r\n", "<br>")
                             v = str(v).replace("\n", "<br>")
                         if need_switch:
-                            out += curshift + '<tr class="child-{}" style="background-color:{}">\n'.format(tid,c)
+                            tr = curshift + '<tr class="child-{}" style="background-color:{}">\n'.format(tid,c)
                         else:
-                            out += curshift + "<tr>\n"
-                        out += curshift + "    " + "<td valign=\"top\"><b>" + str(k) + "</b></td>\n"
-                        out += curshift + "    " + "<td>" + str(v) + "</td>\n"
-                        out += curshift + "</tr>\n"
-                    # + sepbar
-                    #out += curshift + "<tr><td></td><td></td></tr>\n"
-                out += curshift + "</table>\n"
+                            tr = curshift + "<tr>\n"
+                        yield (tr
+                            + curshift + "    " + "<td valign=\"top\"><b>" + str(k) + "</b></td>\n"
+                            + curshift + "    " + "<td>" + str(v) + "</td>\n"
+                            + curshift + "</tr>\n")
+                yield curshift + "</table>\n"
             else:
                 tid = "".join([random.choice(string.ascii_letters) for _ in range(20)])
                 tw = 'width="100%"' if lvl != 0 else ""
-                out += curshift + "<table {} border={} {}>\n".format(style, inlist_border,tw)
+                yield curshift + "<table {} border={} {}>\n".format(style, inlist_border,tw)
                 if self.__collapseandexpand  :
-                    out += curshift + """<tr class="parent" id="{}" title="Click to expand/collapse" style="cursor: pointer;"> <td bgcolor="#FFFFCC">L({})</td> </tr>\n""".format(tid,len(obj))
+                    yield curshift + """<tr class="parent" id="{}" title="Click to expand/collapse" style="cursor: pointer;"> <td bgcolor="#FFFFCC">L({})</td> </tr>\n""".format(tid,len(obj))
+                head = curshift + '<tr class="child-{}">\n'.format(tid) + curshift + "    " + "<td valign=\"top\">\n"
+                tail = "\n" + curshift + "    " + "</td>\n" + curshift + "</tr>\n"
                 for o in obj:
-                    out += curshift + '<tr class="child-{}">\n'.format(tid)
-                    out += curshift + "    " + "<td valign=\"top\">\n"
-                    out += self.json2html_helper(o,lvl+2)
-                    out += "\n"
-                    out += curshift + "    " + "</td>\n"
-                    out += curshift + "</tr>\n"
-                out += curshift + "</table>\n"
-            return out
+                    yield head
+                    yield (o, lvl+2)
+                    yield tail
+                yield curshift + "</table>\n"
+            return
         if type(obj) is dict:
             if self.__sort:
                 if self.__sort_by_val:
@@ -232,30 +267,24 @@ class JsonConverter:
             else:
                 fs = lambda t: t
             if self.__sortkeywords:
-                def f(s):
-                    stbl = {
-                        s: ix
-                        for ix, s in enumerate(re.split(r",", self.__sortkeywords))
-                    }
-                    return (stbl.get(s, 999999), s)
-
-                fs = lambda t: f(t[0])
+                stbl = {
+                    s: ix
+                    for ix, s in enumerate(re.split(r",", self.__sortkeywords))
+                }
+                fs = lambda t: (stbl.get(t[0], 999999), t[0])
             style = 'style="{};{}"'.format(self.__tblattr, colstr)
             tid = "".join([random.choice(string.ascii_letters) for _ in range(20)])
             tw = 'width="100%"' if lvl != 0 else ""
-            out += curshift + "<table {} border={} {}>\n".format(style, inlist_border,tw)
+            yield curshift + "<table {} border={} {}>\n".format(style, inlist_border,tw)
             if self.__collapseandexpand :
-                out += curshift + """<tr class="parent" id="{}" title="Click to expand/collapse" style="cursor: pointer;"> <td bgcolor="#FFFFCC">D({})</td> </tr>\n""".format(tid,len(obj))
+                yield curshift + """<tr class="parent" id="{}" title="Click to expand/collapse" style="cursor: pointer;"> <td bgcolor="#FFFFCC">D({})</td> </tr>\n""".format(tid,len(obj))
+            tr = curshift + '<tr class="child-{}">\n'.format(tid)
+            tail = "\n" + curshift + "    " + "</td>\n" + curshift + "</tr>\n"
             for k, v in sorted(obj.items(), key=fs):
-                out += curshift + '<tr class="child-{}">\n'.format(tid)
-                out += curshift + "<td valign=\"top\"><b>" + str(k) + "</b></td>\n"
-                out += curshift + "    " + "<td>\n"
-                out += self.json2html_helper(v,lvl+2)
-                out += "\n"
-                out += curshift + "    " + "</td>\n"
-                out += curshift + "</tr>\n"
-            out += curshift + "</table>\n"
-            return out
+                yield tr + curshift + "<td valign=\"top\"><b>" + str(k) + "</b></td>\n" + curshift + "    " + "<td>\n"
+                yield (v, lvl+2)
+                yield tail
+            yield curshift + "</table>\n"
 
 
 def main():
@@ -332,6 +361,12 @@ def main():
         default=False,
         help="make the HTML table able to expand/collapse. this may make it looks less formal.",
     )
+    parser.add_argument(
+        "--json-backend",
+        dest="jsonbackend",
+        default="auto",
+        help="JSON library to use : {}. default auto, the first available.".format(",".join(jsoncodec.available())),
+    )
     parser.add_argument(
         "-X",
         "--debug",
@@ -341,6 +376,11 @@ def main():
         help="debug mode",
     )
     args = parser.parse_args()
+    try:
+        jsoncodec.use(args.jsonbackend)
+    except ValueError as e:
+        print("# {}".format(e))
+        sys.exit(-1)
 
     if args.infile:
         if not os.path.isfile(args.infile):
@@ -365,21 +405,20 @@ def main():
         )
         sys.exit(0)
 
-    print(
-        JsonConverter(
-            INPUT,
-            tblattr=args.attributes,
-            sort=args.sorted,
-            sort_by_val=args.dtbyval,
-            sortkeywords=args.keyorder,
-            recursive=args.recursive,
-            keys_included=args.keys_included,
-            keys_excluded=args.keys_excluded,
-            colors=args.colors,
-            collapseandexpand=args.collapseandexpand,
-            maxrows=args.maxrows,
-        ).json2html()
-    )
+    JsonConverter(
+        INPUT,
+        tblattr=args.attributes,
+        sort=args.sorted,
+        sort_by_val=args.dtbyval,
+        sortkeywords=args.keyorder,
+        recursive=args.recursive,
+        keys_included=args.keys_included,
+        keys_excluded=args.keys_excluded,
+        colors=args.colors,
+        collapseandexpand=args.collapseandexpand,
+        maxrows=args.maxrows,
+    ).write(sys.stdout)
+    print()
 
 
 if __name__ == "__main__":
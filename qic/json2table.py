@@ -4,78 +4,187 @@
 import sys
 import argparse
 import os
-import json
 import traceback
+import operator
+from itertools import (islice,chain)
 from .tblfmt import SimpleTable
+from . import jsoncodec
+from . import extsort
+from .jsonstream import iter_records
+
+def _cell(path) :
+    # one -H column. a dotted name reaches into nested dicts, and lists by
+    # index, unless the record has it as a key of its own.
+    if "." not in path :
+        return lambda r : r.get(path,"")
+    segs = path.split(".")
+    def get(r) :
+        if path in r :
+            return r[path]
+        o = r
+        for s in segs :
+            if type(o) is dict and s in o :
+                o = o[s]
+            elif type(o) is list and s.isdigit() and int(s) < len(o) :
+                o = o[int(s)]
+            else :
+                return ""
+        return o
+    return get
+
+def _accessor(header) :
+    # a dict record's cells under header, missing ones read ""
+    if any(["." in h for h in header]) :
+        cells = [_cell(h) for h in header]
+        return lambda r : [c(r) for c in cells]
+    getter = operator.itemgetter(*header)
+    one = len(header) == 1
+    def get(r) :
+        try :
+            return [getter(r)] if one else list(getter(r))
+        except KeyError :
+            return [r.get(h,"") for h in header]
+    return get
+
+def iter_rows(records, header) :
+    # rows of a list of lists or a list of dicts, one record at a time. an
+    # empty header is filled in on the way, from the first list or from the
+    # keys of the dicts as they show up; earlier rows are then short of the
+    # later columns. cells are left as they are. ValueError for anything else.
+    kind = None
+    get = None
+    known = set(header)
+    for rec in records :
+        if kind is None :
+            kind = type(rec)
+            if kind not in [list,dict] :
+                raise ValueError("not a list of lists or of dicts")
+            if kind is dict and header :
+                get = _accessor(header)
+        elif type(rec) is not kind :
+            raise ValueError("not a list of lists or of dicts")
+        if kind is list :
+            if not header :
+                header.extend([str(c) for c in rec])
+                continue
+            yield rec
+        elif get :
+            yield get(rec)
+        else :
+            keys = list(rec)
+            if keys != header :
+                for k in keys :
+                    if k not in known :
+                        known.add(k)
+                        header.append(k)
+                if keys == header :
+                    yield list(rec.values())
+                else :
+                    yield [rec.get(h,"") for h in header]
+            else :
+                yield list(rec.values())
 
 def prepare_table(xjson,xheader=None) :
     header=list()
     if xheader :
         header = [ h for h in xheader.split(",") if h]
-    data = list()
     try:
         if type(xjson) is str :
-            js = json.loads(xjson)
+            js = jsoncodec.loads(xjson)
         else :
             js = xjson
-        if type(js) is list and all([type(i) is list for i in js]) :
-            for row in js :
-                r=list()
-                for col in row :
-                    r.append(str(col))
-                data.append(r)
-        elif type(js) is list and all([type(i) is dict for i in js]) :
-            # now each row is a dict
-            if not header :
-                loaded=set()
-                for row in js :
-                    for k in row.keys() :
-                        if k not in loaded :
-                            header.append(k)
-                            loaded.add(k)
-            for row in js :
-                r=list()
-                for h in header :
-                    r.append(row.get(h,""))
-                data.append(r)
-        else :
-            print("# not supported format.")
-            print(json.dumps(js,indent=2))
-            return (None,None)
     except:
         traceback.print_exc()
-        if args.debug:
-            print(INPUT)
         return (None,None)
-    if header :
-        return (data,header)
-    else :
-        return (data[1:],data[0])
+    try:
+        data = list(iter_rows(js,header)) if type(js) is list else None
+    except ValueError :
+        data = None
+    if data is None :
+        print("# not supported format.")
+        print(jsoncodec.dumps(js,indent=2))
+        return (None,None)
+    if data and type(js[0]) is dict :
+        # columns found late are blank in the rows before them
+        for r in data :
+            if len(r) < len(header) :
+                r.extend([""] * (len(header) - len(r)))
+    return (data,header)
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-f", "--infile", dest="infile", help="input file")
-    parser.add_argument("-H", "--header", dest="header", help="optional header")
+    parser.add_argument("-H", "--header", dest="header", help="optional header. a dotted name like meta.host picks from nested objects.")
     parser.add_argument("-m", "--maxrows", dest="maxrows", type=int, default=2**30, help="max rows per table")
+    parser.add_argument("-s", "--sortby", dest="sortby", help="columns to order --top/--bottom by, names or ids starting with 0.")
+    parser.add_argument("--top", dest="top", type=int, help="only the N biggest rows by -s, biggest first. without -s the first N rows.")
+    parser.add_argument("--bottom", dest="bottom", type=int, help="only the N smallest rows by -s, smallest first. without -s the last N rows.")
+    parser.add_argument("-b", "--batch", dest="batch", type=int, help="print rows as they come in, columns sized by the first N rows.")
+    parser.add_argument("--json-backend", dest="jsonbackend", default="auto", help="JSON library to use : {}. default auto, the first available.".format(",".join(jsoncodec.available())))
     parser.add_argument("-X", "--debug", dest="debug", action="store_true", default=False, help="debug mode",)
     args = parser.parse_args()
+    try :
+        jsoncodec.use(args.jsonbackend)
+    except ValueError as e :
+        print("# {}".format(e))
+        sys.exit(-1)
 
     if args.infile:
         if not os.path.isfile(args.infile):
             print("# {} not exists.".format(args.infile))
-        with open(args.infile, "r") as f:
-            INPUT = f.read()
+        INPUT = open(args.infile, "r")
     else:
-        INPUT = sys.stdin.read()
+        INPUT = sys.stdin
+
+    # rows are read as the records come in, and no further than needed
+    header = [ h for h in (args.header or "").split(",") if h]
+    data = iter_rows(iter_records(INPUT,array=True),header)
+
+    key = None
+    if args.sortby and (args.top is not None or args.bottom is not None) :
+        names = [c for c in args.sortby.split(",") if c]
+        cols = [int(c) if c.isdigit() else None for c in names]
+        numeric = extsort.numeric_key(list(range(len(names))))
+        def key(r) :
+            # a column is looked up once it has been seen, before that and
+            # in rows too short for it the cell reads ""
+            if None in cols :
+                for i, c in enumerate(names) :
+                    if cols[i] is None and c in header :
+                        cols[i] = header.index(c)
+            return numeric([r[i] if i is not None and i < len(r) else "" for i in cols])
 
-    data,header = prepare_table(INPUT,args.header)
+    try :
+        if args.top is not None :
+            data = extsort.top(data,args.top,key)
+        elif args.bottom is not None :
+            data = extsort.bottom(data,args.bottom,key)
+        if args.maxrows < 2**30 :
+            data = islice(data,args.maxrows)
+        if args.batch :
+            # widths from the first rows, the rest printed as it arrives
+            first = list(islice(data,args.batch))
+            t = SimpleTable(data=chain(first,data),header=list(header),noheader=True if not header else False,sample=len(first))
+            for ln in t.iter_lines() :
+                sys.stdout.write(ln + "\n")
+                sys.stdout.flush()
+            print()
+            return
+        data = list(data)
+    except ValueError as e :
+        print("# not supported format. {}".format(e))
+        return
+    finally :
+        if args.infile :
+            INPUT.close()
 
     if args.debug :
         print("header = ",header)
         print("data = ",data)
     #data=None, header=None, cols=None, maxwidth=-1, noheader=False,tree=False
-    print(SimpleTable(data=data,header=header,maxrows=args.maxrows,noheader=True if not header else False))
+    SimpleTable(data=data,header=header,maxrows=args.maxrows,noheader=True if not header else False).write(sys.stdout)
+    print()
 
 if __name__ == "__main__":
     main()
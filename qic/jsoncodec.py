@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import re
+import json
+
+# name -> (loads, dumps). dumps(obj,indent,sort_keys) returns None when it
+# can not produce exactly what json.dumps would, the caller then falls back.
+_x_backends = dict()
+_x_state = {"name":"json","loads":json.loads,"dumps":None,"exact":False}
+# integers past 64 bits come back as floats from the fast parsers. digits
+# are mapped to "0" and 19 of them looked for as a plain substring, a lot
+# faster than a regex over the whole input.
+_x_digits = (str.maketrans("123456789","000000000"),"0" * 19,".eE")
+_x_digits_b = (bytes.maketrans(b"123456789",b"000000000"),b"0" * 19,b".eE")
+
+def _bigint(s, size=2**20) :
+    table, zeros, frac = _x_digits if type(s) is str else _x_digits_b
+    for i in range(0,len(s),size) :
+        part = s[i:i+size+18].translate(table)
+        j = part.find(zeros)
+        while j >= 0 :
+            # only where the digits start a number, not a fraction or exponent
+            start = i + j
+            while start > 0 and s[start-1:start].translate(table) == zeros[:1] :
+                start -= 1
+            if start == 0 or s[start-1:start] not in frac :
+                return True
+            j = part.find(zeros,j + 19)
+    return False
+
+def register(name, loads, dumps=None) :
+    _x_backends[name] = (loads,dumps)
+
+def available() :
+    return list(_x_backends.keys())
+
+def use(name="auto") :
+    if name in [None,"","auto"] :
+        name = next(iter(_x_backends))
+    if name not in _x_backends :
+        raise ValueError("json backend {} is not available, choose from {}".format(name,",".join(available())))
+    _x_state["name"] = name
+    _x_state["loads"], _x_state["dumps"] = _x_backends[name]
+    _x_state["exact"] = False
+    return name
+
+def current() :
+    return _x_state["name"]
+
+def loads(s) :
+    if _x_state["name"] == "json" :
+        return json.loads(s)
+    try :
+        if not _bigint(s) :
+            return _x_state["loads"](s)
+    except ValueError :
+        pass
+    # NaN, huge integers, lone surrogates ... only json can round-trip these,
+    # keep dumping with json from now on.
+    obj = json.loads(s)
+    _x_state["exact"] = True
+    return obj
+
+def dumps(obj, indent=None, sort_keys=False) :
+    if _x_state["dumps"] and not _x_state["exact"] :
+        s = _x_state["dumps"](obj,indent,sort_keys)
+        if s is not None :
+            return s
+    return json.dumps(obj,indent=indent,sort_keys=sort_keys)
+
+def _count(obj, limit) :
+    # the values in obj, containers included, counted no further than limit
+    if type(obj) is dict :
+        obj = obj.values()
+    elif type(obj) is not list and type(obj) is not tuple :
+        return 1
+    n = 1 + len(obj)
+    for v in obj :
+        if n > limit :
+            break
+        t = type(v)
+        if t is dict or t is list or t is tuple :
+            n += _count(v,limit - n) - 1
+    return n
+
+def iterdumps(obj, indent=None, sort_keys=False, batch=4096, depth=0) :
+    # same text as dumps(), about `batch` values at a time. a slice of a
+    # container dumps as "[" + inner + "]" with its elements one level down,
+    # so the inner parts only need joining, and shifting right when the
+    # container is itself nested. an element too big for a slice is written
+    # the same way on its own.
+    pad = "" if indent is None else "\n" + " " * (indent * depth)
+    def shift(s) :
+        return s.replace("\n",pad) if depth and indent is not None else s
+    if type(obj) is tuple :
+        obj = list(obj)
+    if not obj or type(obj) not in [list,dict] \
+       or (type(obj) is dict and not all([type(k) is str for k in obj])) \
+       or _count(obj,batch) <= batch :
+        yield shift(dumps(obj,indent=indent,sort_keys=sort_keys))
+        return
+    isdict = type(obj) is dict
+    items = (sorted(obj) if sort_keys else list(obj)) if isdict else obj
+    tail = 1 if indent is None else 2
+    sep = ", " if indent is None else ","
+    inner = "" if indent is None else "\n" + " " * (indent * (depth + 1))
+    run = list()
+    used = 0
+    first = True
+    yield "{" if isdict else "["
+    for item in items :
+        v = obj[item] if isdict else item
+        n = _count(v,batch)
+        if run and used + n > batch :
+            s = dumps({k:obj[k] for k in run} if isdict else run,indent=indent,sort_keys=sort_keys)
+            yield ("" if first else sep) + shift(s[1:-tail])
+            first = False
+            run = list()
+            used = 0
+        if n > batch :
+            yield ("" if first else sep) + inner + (json.dumps(item) + ": " if isdict else "")
+            first = False
+            yield from iterdumps(v,indent,sort_keys,batch,depth + 1)
+            continue
+        run.append(item)
+        used += n
+    if run :
+        s = dumps({k:obj[k] for k in run} if isdict else run,indent=indent,sort_keys=sort_keys)
+        yield ("" if first else sep) + shift(s[1:-tail])
+    yield pad + ("}" if isdict else "]")
+
+try :
+    import orjson
+    # json writes floats below 1e-4 or from 1e16 with an exponent and escapes
+    # everything outside printable ascii; bail out when any of that shows up.
+    _x_exponent = re.compile(rb"\d[eE][-+]?\d")
+    _x_inf = float("inf")
+    def _nonfinite(obj) :
+        # orjson writes NaN and Infinity as null, json keeps them
+        stack = [obj]
+        while stack :
+            o = stack.pop()
+            if isinstance(o,dict) :
+                stack.extend(o.values())
+            elif isinstance(o,(list,tuple)) :
+                stack.extend(o)
+            elif isinstance(o,float) and (o != o or o in (_x_inf,-_x_inf)) :
+                return True
+        return False
+    def _orjson_dumps(obj, indent, sort_keys) :
+        if indent != 2 :
+            return None
+        opt = orjson.OPT_INDENT_2 | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if sort_keys :
+            opt |= orjson.OPT_SORT_KEYS
+        try :
+            b = orjson.dumps(obj,option=opt)
+        except TypeError :
+            return None
+        if not b.isascii() or b"0.0000" in b or b"\x7f" in b or _x_exponent.search(b) :
+            return None
+        if b"null" in b and _nonfinite(obj) :
+            return None
+        return b.decode()
+    register("orjson",orjson.loads,_orjson_dumps)
+except ImportError :
+    pass
+
+try :
+    import simdjson
+    register("simdjson",simdjson.loads)
+except ImportError :
+    pass
+
+try :
+    import ujson
+    register("ujson",ujson.loads)
+except ImportError :
+    pass
+
+register("json",json.loads)
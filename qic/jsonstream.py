@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import re
+import json
+from . import jsoncodec
+
+_x_decoder = json.JSONDecoder()
+_x_struct = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]\{\}]')
+_x_space = re.compile(r"\s*")
+
+def _depth(s,depth=0) :
+    for m in _x_struct.finditer(s) :
+        c = m.group()
+        if c in "[{" :
+            depth += 1
+        elif c in "]}" :
+            depth -= 1
+    return depth
+
+def iter_records(lines, array=False) :
+    # records may be one per line (NDJSON), back to back on a line ({..}{..}),
+    # or spread over several lines. JSON strings never hold a raw newline, so a
+    # record only needs more input while its brackets are still open. with
+    # `array`, input that starts with "[" is one array and its elements are
+    # the records.
+    pending = list()
+    depth = 0
+    lno = 0
+    # None until the input starts, then whether it is an array. in one,
+    # what may come next: "[" a value or the end, "," either or the end,
+    # None a value, "]" nothing
+    inarray = None if array else False
+    nextc = None
+    def invalid(e) :
+        # where the decoder stopped in the text it was given says little
+        return ValueError("invalid JSON record near line {}: {}".format(lno,getattr(e,"msg",e)))
+    for ln in lines :
+        lno += 1
+        if pending :
+            pending.append(ln)
+            depth = _depth(ln,depth)
+            if depth > 0 :
+                continue
+            text = "".join(pending)
+            pending = list()
+        else :
+            # the common case, one whole record on the line
+            if inarray is False :
+                try :
+                    obj = jsoncodec.loads(ln)
+                except ValueError :
+                    obj = ln
+                if obj is not ln :
+                    yield obj
+                    continue
+            text = ln
+        pos = _x_space.match(text).end()
+        while pos < len(text) :
+            if inarray is None :
+                inarray = text[pos] == "["
+                if inarray :
+                    pos = _x_space.match(text,pos + 1).end()
+                    nextc = "["
+                    continue
+            if inarray :
+                c = text[pos]
+                if nextc == "]" :
+                    raise invalid("Extra data after the array")
+                if nextc in ["[",","] and c == "]" :
+                    nextc = "]"
+                    pos = _x_space.match(text,pos + 1).end()
+                    continue
+                if nextc == "," :
+                    if c != "," :
+                        raise invalid("Expecting ',' delimiter")
+                    nextc = None
+                    pos = _x_space.match(text,pos + 1).end()
+                    continue
+            try :
+                obj, pos = _x_decoder.raw_decode(text,pos)
+            except ValueError as e :
+                rest = text[pos:]
+                depth = _depth(rest)
+                if depth > 0 :
+                    pending.append(rest)
+                    break
+                raise invalid(e)
+            yield obj
+            if inarray :
+                nextc = ","
+            pos = _x_space.match(text,pos).end()
+    if pending :
+        text = "".join(pending)
+        try :
+            obj, pos = _x_decoder.raw_decode(text,_x_space.match(text).end())
+        except ValueError as e :
+            raise invalid(e)
+        yield obj
+    if inarray and nextc != "]" :
+        raise invalid("Expecting ']'")
+
+_x_key = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:')
+
+def _run_patterns(levels=6) :
+    # a run consumes strings, scalars and balanced brackets nested up to
+    # `levels` deep in one match. needs possessive quantifiers (python 3.11+),
+    # without them the backtracking state grows with the input.
+    try :
+        base = r'[^"\[\]\{\}]++|"(?:[^"\\]++|\\.)*+"'
+        run = "(?:{})*+".format(base)
+        for _ in range(levels) :
+            run = r"(?:{0}|\[{1}\]|\{{{1}\}})*+".format(base,run)
+        # and one list element with the comma after it
+        element = r'(?:[^"\[\]\{{\}},]++|"(?:[^"\\]++|\\.)*+"|\[{0}\]|\{{{0}\}})++,'.format(run)
+        return (re.compile(run), re.compile(r"\[{0}\]|\{{{0}\}}".format(run)), re.compile(element))
+    except re.error :
+        return (re.compile(r'[^"\[\]\{\}]*(?:"(?:[^"\\]|\\.)*"[^"\[\]\{\}]*)*'), None, None)
+
+_x_run, _x_container, _x_element = _run_patterns()
+_x_segment = re.compile(r"\.\s*(\w+)|\.\s*\<\s*([^\<\>]+?)\s*\>|\[\s*(-?\d*\s*:\s*-?\d*)?\s*\]|\[\s*(\d+)\s*\]")
+_x_numtail = re.compile(r"[\d\.eE\+\-]*\Z")
+_x_root = re.compile(r"(?<![\w\.'\"])_(?!\w)")
+
+def leading_path(code, whole=False) :
+    # the part of a query like _.items[].id that decides which data is read.
+    # keys are lowercased, None stands for every element, int for one element.
+    # with `whole` only a query that is nothing but keys and indexes counts.
+    if not code :
+        return None
+    roots = list(_x_root.finditer(code))
+    if len(roots) != 1 :
+        return None
+    pos = roots[0].end()
+    path = list()
+    while True :
+        m = _x_segment.match(code,pos)
+        if not m :
+            break
+        if m.group(1) is not None :
+            if code[m.end():].lstrip().startswith("(") :
+                break
+            path.append(m.group(1).lower())
+        elif m.group(2) is not None :
+            path.append(m.group(2).lower())
+        elif m.group(4) is not None :
+            path.append(int(m.group(4)))
+        else :
+            path.append(None)
+        pos = m.end()
+    if whole :
+        if code[pos:].strip() or None in path :
+            return None
+        return path
+    if not path :
+        return None
+    return path
+
+
+def _prune(obj, path, i=0) :
+    if i >= len(path) :
+        return obj
+    seg = path[i]
+    if type(seg) is str and type(obj) is dict :
+        return {k:_prune(v,path,i+1) for k,v in obj.items() if k.lower() == seg}
+    if type(seg) is not str and type(obj) is list :
+        if seg is None :
+            return [_prune(v,path,i+1) for v in obj]
+        res = [None] * min(seg,len(obj))
+        if seg < len(obj) :
+            res.append(_prune(obj[seg],path,i+1))
+        return res
+    return obj
+
+
+def _head(obj, rows, cuts, pos) :
+    # lists of a freshly decoded value cut to `rows`, in place
+    if type(obj) is dict :
+        for k, v in obj.items() :
+            if type(v) in [dict,list] :
+                obj[k] = _head(v,rows,cuts,pos+".{}".format(k))
+    elif type(obj) is list :
+        if len(obj) > rows :
+            cuts.append((pos,len(obj)))
+            del obj[rows:]
+        for i, v in enumerate(obj) :
+            if type(v) in [dict,list] :
+                obj[i] = _head(v,rows,cuts,pos+"[{}]".format(i))
+    return obj
+
+
+class PathReader :
+    def __init__(self, chunks) :
+        self.__chunks = iter(chunks)
+        self.__buf = ""
+        self.__pos = 0
+        self.__eof = False
+        self.__rows = None
+        self.__cuts = list()
+
+    def __fill(self) :
+        if self.__eof :
+            return False
+        try :
+            chunk = next(self.__chunks)
+        except StopIteration :
+            self.__eof = True
+            return False
+        self.__buf = self.__buf[self.__pos:] + chunk
+        self.__pos = 0
+        return True
+
+    def __grow(self) :
+        # read at least as much again as is pending so retries stay linear
+        need = len(self.__buf) - self.__pos
+        got = False
+        while self.__fill() :
+            got = True
+            if len(self.__buf) >= 2 * need :
+                break
+        return got
+
+    def __peek(self) :
+        while True :
+            self.__pos = _x_space.match(self.__buf,self.__pos).end()
+            if self.__pos < len(self.__buf) :
+                return self.__buf[self.__pos]
+            if not self.__fill() :
+                return ""
+
+    def __next(self, expected) :
+        c = self.__peek()
+        if c not in expected :
+            raise ValueError("invalid JSON: expecting '{}' but got '{}'".format(expected,c))
+        self.__pos += 1
+        return c
+
+    def __value(self) :
+        self.__peek()
+        while True :
+            try :
+                obj, end = _x_decoder.raw_decode(self.__buf,self.__pos)
+                # a number cut by the chunk boundary still decodes, e.g. "1." -> 1
+                if self.__eof or not (type(obj) in [int,float] and _x_numtail.match(self.__buf,end)) :
+                    self.__pos = end
+                    return obj
+            except ValueError :
+                if self.__eof :
+                    raise
+            if not self.__grow() and not self.__eof :
+                raise ValueError("invalid JSON: unexpected end of input")
+
+    def __key(self) :
+        self.__peek()
+        while True :
+            m = _x_key.match(self.__buf,self.__pos)
+            if m :
+                self.__pos = m.end()
+                k = m.group(1)
+                return json.loads('"' + k + '"') if "\\" in k else k
+            if self.__eof or self.__buf[self.__pos] != '"' :
+                raise ValueError("invalid JSON: expecting property name")
+            if not self.__grow() :
+                raise ValueError("invalid JSON: expecting property name")
+
+    def __skip(self) :
+        if self.__peek() not in "[{" :
+            self.__value()
+            return
+        if _x_container :
+            m = _x_container.match(self.__buf,self.__pos)
+            if m :
+                self.__pos = m.end()
+                return
+        self.__pos += 1
+        depth = 1
+        while True :
+            self.__pos = _x_run.match(self.__buf,self.__pos).end()
+            if self.__pos >= len(self.__buf) :
+                if not self.__fill() :
+                    raise ValueError("invalid JSON: unexpected end of input")
+                continue
+            c = self.__buf[self.__pos]
+            if c == '"' :
+                if not self.__grow() :
+                    raise ValueError("invalid JSON: unterminated string")
+                continue
+            self.__pos += 1
+            if c in "[{" :
+                depth += 1
+            else :
+                depth -= 1
+                if depth == 0 :
+                    return
+
+    def __head(self, pos) :
+        # a value with its lists cut to __rows. big containers are walked so
+        # the elements past that are skipped instead of built.
+        c = self.__peek()
+        if c not in "[{" :
+            return self.__value()
+        if _x_container :
+            m = _x_container.match(self.__buf,self.__pos)
+            if m and m.end() - self.__pos < 2**16 :
+                return _head(self.__value(),self.__rows,self.__cuts,pos)
+        self.__pos += 1
+        if c == "{" :
+            res = dict()
+            if self.__peek() == "}" :
+                self.__pos += 1
+                return res
+            while True :
+                k = self.__key()
+                res[k] = self.__head(pos+".{}".format(k))
+                if self.__next(",}") == "}" :
+                    return res
+        res = list()
+        if self.__peek() == "]" :
+            self.__pos += 1
+            return res
+        # the notice goes before the ones of the elements
+        ix = len(self.__cuts)
+        self.__cuts.append(None)
+        n = 0
+        while True :
+            if n < self.__rows :
+                res.append(self.__head(pos+"[{}]".format(n)))
+            else :
+                # past the limit elements are only counted
+                m = _x_element.match(self.__buf,self.__pos) if _x_element else None
+                while m :
+                    n += 1
+                    self.__pos = m.end()
+                    m = _x_element.match(self.__buf,self.__pos)
+                self.__skip()
+            n += 1
+            if self.__next(",]") == "]" :
+                self.__cuts[ix] = (pos,n)
+                return res
+
+    def __select(self, path, i) :
+        if i >= len(path) :
+            if self.__rows is not None :
+                return self.__head("_")
+            return self.__value()
+        seg = path[i]
+        c = self.__peek()
+        if type(seg) is str and c == "{" :
+            self.__pos += 1
+            res = dict()
+            if self.__peek() == "}" :
+                self.__pos += 1
+                return res
+            while True :
+                k = self.__key()
+                if k.lower() == seg :
+                    res[k] = self.__select(path,i+1)
+                else :
+                    self.__skip()
+                if self.__next(",}") == "}" :
+                    return res
+        if type(seg) is not str and c == "[" :
+            self.__pos += 1
+            res = list()
+            if self.__peek() == "]" :
+                self.__pos += 1
+                return res
+            n = 0
+            while True :
+                if seg is None :
+                    # elements are usually small records, decoding them whole
+                    # and pruning beats walking their tokens.
+                    res.append(_prune(self.__value(),path,i+1))
+                elif n == seg :
+                    res.append(self.__select(path,i+1))
+                elif n < seg :
+                    self.__skip()
+                    res.append(None)
+                else :
+                    self.__skip()
+                n += 1
+                if self.__next(",]") == "]" :
+                    return res
+        return self.__value()
+
+    def select(self, path, rows=None, cut=None) :
+        # with `rows` the lists of the selected value keep that many elements,
+        # cut(path,oldlen) is told about each one cut, the value being "_".
+        if self.__peek() == "" :
+            return dict()
+        self.__rows = rows
+        self.__cuts = list()
+        res = self.__select(path,0)
+        if self.__peek() != "" :
+            raise ValueError("invalid JSON: extra data after document")
+        if cut :
+            for pos, n in self.__cuts :
+                if n > rows :
+                    cut(pos,n)
+        return res
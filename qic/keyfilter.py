@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import re
+
+
+class _Decisions(dict) :
+    # a decision per key spelling, made on first sight. other key types are
+    # not remembered, True, 1 and 1.0 would share an entry.
+    def __init__(self, decide, *args) :
+        self.__decide = decide
+        self.__args = args
+
+    def __missing__(self, k) :
+        res = self.__decide(str(k).lower(),*self.__args)
+        if type(k) is str :
+            self[k] = res
+        return res
+
+
+class KeyFilter :
+    # -K/-E compiled once. a key is kept when it is not excluded and either
+    # nothing is included, it is under a key included with a trailing * / +,
+    # or it is included itself. excluded keys go at any depth.
+    def __init__(self, included=None, excluded=None) :
+        marks = dict()
+        for w in (included or "").split(",") :
+            recursive = 0
+            if re.search(r"(\*|\/|\+)+$",w) :
+                recursive = 1
+                w = re.sub(r"(\*|\/|\+)+$","",w)
+            if w :
+                marks[w.lower()] = recursive
+        self.included = set(marks)
+        self.recursive = set([w for w, r in marks.items() if r])
+        self.excluded = set()
+        for w in (excluded or "").split(",") :
+            if w :
+                self.excluded.add(w.lower())
+        # key -> kept or not, outside and inside a recursively included key
+        self.__keep = (_Decisions(self.__kept,False),_Decisions(self.__kept,True))
+        self.__descend = _Decisions(lambda lk : lk in self.recursive)
+
+    def __bool__(self) :
+        return bool(self.included or self.excluded)
+
+    def __kept(self, lk, inside) :
+        if lk in self.excluded :
+            return False
+        return inside or not self.included or lk in self.included
+
+    def active(self, inside=False) :
+        # does anything get dropped at this level. `inside` tells whether we
+        # are under a recursively included key.
+        return bool(self.excluded) or (bool(self.included) and not inside)
+
+    def child(self, k, inside=False) :
+        return inside or not self.included or self.__descend[k]
+
+    def items(self, d, inside=False) :
+        keep = self.__keep[1 if inside else 0]
+        return [(k,v) for k, v in d.items() if keep[k]]
+
+    def apply(self, ds, inside=False) :
+        # one walk over what is kept, subtrees dropped or left untouched are
+        # not visited. dicts are rebuilt, lists only copied when they change.
+        if not self.active(inside) :
+            return ds
+        if type(ds) is dict :
+            res = dict()
+            for k, v in self.items(ds,inside) :
+                res[k] = self.apply(v,self.child(k,inside)) if type(v) in [dict,list] else v
+            return res
+        if type(ds) is list :
+            res = None
+            for i, v in enumerate(ds) :
+                if type(v) in [dict,list] :
+                    nv = self.apply(v,inside)
+                    if nv is not v :
+                        if res is None :
+                            res = list(ds)
+                        res[i] = nv
+            return ds if res is None else res
+        return ds
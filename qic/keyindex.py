@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+_x_containers = (dict,list,tuple)
+
+
+class PathStat :
+    # one node per key path, keys lowercased: "items[].price"
+    __slots__ = ("path","spellings","types","minlen","maxlen","children","lower","items")
+
+    def __init__(self, path) :
+        self.path = path
+        self.spellings = set()
+        self.types = dict()
+        self.minlen = None
+        self.maxlen = None
+        self.children = dict()
+        self.lower = dict()
+        self.items = None
+
+    def child(self, k) :
+        # children is keyed by spelling so the walk skips lower() per key
+        st = self.children.get(k)
+        if st is None :
+            lk = k.lower()
+            st = self.lower.get(lk)
+            if st is None :
+                st = PathStat(self.path + "." + lk if self.path else lk)
+                self.lower[lk] = st
+            self.children[k] = st
+            st.spellings.add(k)
+        return st
+
+    def item(self) :
+        if self.items is None :
+            self.items = PathStat(self.path + "[]")
+        return self.items
+
+    @property
+    def count(self) :
+        return sum(self.types.values())
+
+    def typenames(self) :
+        return {t.__name__:n for t, n in self.types.items()}
+
+
+class KeyIndex :
+    # key statistics of a document, collected in one walk on first use.
+    # more records can be merged with add() (e.g. --lines).
+    def __init__(self, ds=None) :
+        self.__root = PathStat("")
+        self.__pending = list() if ds is None else [ds]
+        self.__keydt = None
+        self.__found = None
+
+    def add(self, ds) :
+        self.__pending.append(ds)
+
+    def __build(self) :
+        if not self.__pending :
+            return
+        pending, self.__pending = self.__pending, list()
+        self.__keydt = None
+        self.__found = None
+        for ds in pending :
+            t = type(ds)
+            self.__root.types[t] = self.__root.types.get(t,0) + 1
+        # a scalar record only counts as a type, there is nothing to walk
+        stack = [(ds,self.__root) for ds in pending if type(ds) in (dict,list,tuple)]
+        pop, push = stack.pop, stack.append
+        while stack :
+            ds, st = pop()
+            if type(ds) is dict :
+                children = st.children
+                for k, v in ds.items() :
+                    cst = children.get(k) or st.child(k)
+                    t = type(v)
+                    types = cst.types
+                    types[t] = types.get(t,0) + 1
+                    if t is dict or t is list or t is tuple :
+                        push((v,cst))
+            else :
+                n = len(ds)
+                if st.minlen is None or n < st.minlen :
+                    st.minlen = n
+                if st.maxlen is None or n > st.maxlen :
+                    st.maxlen = n
+                if n :
+                    ist = st.items or st.item()
+                    types = ist.types
+                    for v in ds :
+                        t = type(v)
+                        types[t] = types.get(t,0) + 1
+                        if t is dict or t is list or t is tuple :
+                            push((v,ist))
+
+    def stats(self) :
+        self.__build()
+        return self.__stats()
+
+    def __stats(self) :
+        res = list()
+        stack = [self.__root]
+        while stack :
+            st = stack.pop()
+            if st.path :
+                res.append(st)
+            subs = list(st.lower.values())
+            if st.items is not None :
+                subs.append(st.items)
+            stack.extend(sorted(subs,key=lambda x : x.path,reverse=True))
+        return res
+
+    def spellings(self, words=None) :
+        # lowercase key -> set of spellings, what key resolution needs. with
+        # `words` only those are looked up, by a walk that keeps no stats.
+        if words is not None :
+            return self.__lookup(set([w.lower() for w in words]))
+        self.__build()
+        if self.__keydt is None :
+            self.__keydt = self.__collect()
+        return self.__keydt
+
+    def __collect(self) :
+        keydt = dict()
+        for st in self.__stats() :
+            if st.spellings :
+                lk = next(iter(st.spellings)).lower()
+                keydt.setdefault(lk,set()).update(st.spellings)
+        return keydt
+
+    def __lookup(self, words) :
+        if not words :
+            return dict()
+        if self.__found is not None and self.__found[0] == words and self.__found[1] == len(self.__pending) :
+            return self.__found[2]
+        res = dict()
+        if self.__root.lower or self.__root.items is not None :
+            # what has been walked already
+            if self.__keydt is None :
+                self.__keydt = self.__collect()
+            for w in words :
+                if w in self.__keydt :
+                    res[w] = set(self.__keydt[w])
+        # every key looked at so far, records mostly repeat the keys of
+        # the one before
+        seen = set()
+        stack = [ds for ds in self.__pending if type(ds) in _x_containers]
+        pop, extend = stack.pop, stack.extend
+        while stack :
+            ds = pop()
+            if type(ds) is dict :
+                if not ds.keys() <= seen :
+                    for k in ds.keys() - seen :
+                        lk = k.lower() if type(k) is str else None
+                        if lk in words :
+                            res.setdefault(lk,set()).add(k)
+                    seen.update(ds.keys())
+                ds = ds.values()
+            extend([v for v in ds if type(v) in _x_containers])
+        self.__found = (words,len(self.__pending),res)
+        return res
+
+    def keys(self) :
+        return sorted(self.spellings().keys())
+
+    def paths(self) :
+        return [st.path for st in self.stats()]
+
+
+# nothing is the document yet, not even None
+_x_unset = object()
+_x_last = [_x_unset,None]
+
+def index_of(ds) :
+    # the index of the document being queried is reused by _paths(_)
+    if _x_last[0] is not ds :
+        _x_last[0], _x_last[1] = ds, KeyIndex(ds)
+    return _x_last[1]
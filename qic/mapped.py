@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import re
+import mmap
+import codecs
+
+_x_ansi = re.compile(r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]')
+_x_lead = re.compile(rb"\s*")
+_x_blank = b" \t\r\n\x0b\x0c"
+
+
+class MappedFile :
+    # an input file mapped read-only. the content is trimmed by offsets and
+    # decoded straight from the mapping, so the only full copy is the str
+    # handed to the parser.
+    def __init__(self, path) :
+        self.__f = open(path,"rb")
+        try :
+            self.__buf = mmap.mmap(self.__f.fileno(),0,access=mmap.ACCESS_READ)
+        except (ValueError,OSError) :
+            # empty files and pipes can not be mapped
+            self.__buf = self.__f.read()
+        self.start = _x_lead.match(self.__buf).end()
+        end = len(self.__buf)
+        while end > self.start and self.__buf[end-1] in _x_blank :
+            end -= 1
+        self.end = end
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *exc) :
+        self.close()
+
+    def close(self) :
+        if type(self.__buf) is mmap.mmap :
+            self.__buf.close()
+        self.__f.close()
+
+    def __len__(self) :
+        return self.end - self.start
+
+    def has_ansi(self) :
+        # ESC, or CSI (U+009B) as utf-8
+        return self.__buf.find(b"\x1b",self.start,self.end) >= 0 \
+            or self.__buf.find(b"\xc2\x9b",self.start,self.end) >= 0
+
+    def text(self, stripansi=True) :
+        with memoryview(self.__buf) as mv :
+            s = str(mv[self.start:self.end],"utf-8")
+        if stripansi and self.has_ansi() :
+            s = _x_ansi.sub("",s)
+        return s
+
+    def chunks(self, size=2**20) :
+        # utf-8 sequences cut at a chunk boundary are held back by the decoder
+        dec = codecs.getincrementaldecoder("utf-8")()
+        for pos in range(self.start,self.end,size) :
+            s = dec.decode(self.__buf[pos:min(pos + size,self.end)])
+            if s :
+                yield s
+        s = dec.decode(b"",final=True)
+        if s :
+            yield s
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import sys
+
+
+class OutputSink :
+    # stdout, plus the -o file when given. both are opened once and every
+    # result is written to them piece by piece.
+    def __init__(self, outfile=None, stream=None) :
+        self.__stream = stream or sys.stdout
+        self.__file = open(outfile,"w") if outfile else None
+        self.written = 0
+
+    def truncate(self) :
+        if self.__file :
+            self.__file.seek(0)
+            self.__file.truncate()
+
+    def write(self, s) :
+        self.__stream.write(s)
+        if self.__file :
+            self.__file.write(s)
+        self.written += len(s)
+
+    def flush(self) :
+        self.__stream.flush()
+        if self.__file :
+            self.__file.flush()
+
+    def print(self, s="") :
+        self.write(str(s) + "\n")
+        self.flush()
+
+    def stream(self, chunks, hold=2**16) :
+        # chunks are held back until `hold` characters are pending, so when
+        # producing them fails early nothing has been written yet. check
+        # `written` to tell.
+        self.written = 0
+        pending = list()
+        size = 0
+        for c in chunks :
+            pending.append(c)
+            size += len(c)
+            if size >= hold :
+                self.write("".join(pending))
+                self.flush()
+                pending = list()
+                size = 0
+        self.write("".join(pending) + "\n")
+        self.flush()
+
+    def close(self) :
+        self.flush()
+        if self.__file :
+            self.__file.close()
+            self.__file = None
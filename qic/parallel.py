@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import os
+import re
+import locale
+import traceback
+from collections import deque
+from concurrent.futures import (ProcessPoolExecutor,wait,FIRST_COMPLETED)
+from .jsonstream import iter_records
+from . import jsoncodec
+
+_x_ansi = re.compile(r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]')
+_x_worker = dict()
+
+def file_ranges(path, jobs, minsize=2**20, maxsize=2**24) :
+    size = os.path.getsize(path)
+    step = min(maxsize,max(minsize,size // (jobs * 8) + 1))
+    return [(path,start,min(start + step,size)) for start in range(0,size,step)]
+
+def range_lines(path, start, end) :
+    # a range owns every line that starts inside it. decoded as open(path)
+    # would in one process.
+    encoding = locale.getpreferredencoding(False)
+    with open(path,"rb") as f :
+        if start > 0 :
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell()
+        while pos < end :
+            ln = f.readline()
+            if not ln :
+                break
+            pos += len(ln)
+            yield ln.decode(encoding)
+
+def line_batches(fr, size=4096) :
+    batch = list()
+    for ln in fr :
+        batch.append(ln)
+        if len(batch) >= size :
+            yield batch
+            batch = list()
+    if batch :
+        yield batch
+
+def _init(code, modules, keepcolor, backend="json") :
+    from . import dsq
+    jsoncodec.use(backend)
+    ns = dict(vars(dsq))
+    if modules :
+        dsq.load_modules(modules,ns)
+    _x_worker["ns"] = ns
+    _x_worker["code"] = compile(code,"<string>","eval")
+    _x_worker["keepcolor"] = keepcolor
+
+def _run(task) :
+    lines = range_lines(*task) if type(task) is tuple else task
+    if not _x_worker["keepcolor"] :
+        lines = (_x_ansi.sub("",ln) for ln in lines)
+    res = list()
+    for rec in iter_records(lines) :
+        try :
+            x = eval(_x_worker["code"],_x_worker["ns"],{"_":rec})
+            if x :
+                res.append((True,x))
+        except :
+            res.append((False,traceback.format_exc().splitlines()[-1]))
+    return res
+
+def parallel_eval(code, tasks, jobs, modules=None, keepcolor=False, ordered=True) :
+    # yields (ok, result) per record. at most 2*jobs tasks are in flight so
+    # streamed input is not read ahead of the workers.
+    with ProcessPoolExecutor(max_workers=jobs,initializer=_init,initargs=(code,modules,keepcolor,jsoncodec.current())) as pool :
+        pending = deque()
+        tasks = iter(tasks)
+        for task in tasks :
+            pending.append(pool.submit(_run,task))
+            if len(pending) < 2 * jobs :
+                continue
+            if ordered :
+                yield from pending.popleft().result()
+            else :
+                done, _ = wait(pending,return_when=FIRST_COMPLETED)
+                for f in done :
+                    pending.remove(f)
+                    yield from f.result()
+        while pending :
+            if ordered :
+                yield from pending.popleft().result()
+            else :
+                done, _ = wait(pending,return_when=FIRST_COMPLETED)
+                for f in done :
+                    pending.remove(f)
+                    yield from f.result()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import re
+import io
+import ast
+import keyword
+import builtins
+import tokenize
+
+_ALL = "__qic_all__"
+_CHOICE = "__qic_choice__"
+_ATTR = "__qic_attr_"
+_SPECIAL = "__qic_sk{}__"
+
+_x_special = re.compile(r"(?<=[\.\{,])(\s*)\<\s*([^\<\>]+?)\s*\>")
+_x_dotted = re.compile(r"\.\s*[\+\{]?\s*[A-Za-z_]")
+_x_word = re.compile(r"[A-Za-z_]\w*")
+
+
+class QueryError(ValueError) :
+    pass
+
+
+class Mapped :
+    # "for each element" pending on a chain such as _.items[] ; operations on
+    # the chain are pushed into the element until the chain ends.
+    def __init__(self, var, it, sliced=False) :
+        self.var = var
+        self.iter = it
+        self.elt = ast.Name(id=var,ctx=ast.Load())
+        # made by x[a:b] and nothing applied to the elements yet
+        self.sliced = sliced
+
+    def apply(self, fn) :
+        if isinstance(self.elt,Mapped) :
+            self.elt.apply(fn)
+        else :
+            self.elt = fn(self.elt)
+            self.sliced = False
+        return self
+
+    def index(self, fn) :
+        # x[a:b][i] takes the i-th of the slice, as for a list
+        m = self
+        while isinstance(m.elt,Mapped) :
+            if m.elt.sliced :
+                m.elt = fn(m.elt.iter)
+                return self
+            m = m.elt
+        return self.apply(fn)
+
+    def materialize(self) :
+        elt = self.elt.materialize() if isinstance(self.elt,Mapped) else self.elt
+        gen = ast.comprehension(target=ast.Name(id=self.var,ctx=ast.Store()),iter=self.iter,ifs=[],is_async=0)
+        return ast.ListComp(elt=elt,generators=[gen])
+
+
+def _lex(code) :
+    # turn qic syntax into placeholders python can parse:
+    #   x[]      -> x[__qic_all__]
+    #   x.{a,b}  -> x.__qic_choice__(a,b)
+    #   x.+a     -> x.__qic_attr_a
+    #   .<a b>   -> .__qic_sk0__
+    specials = dict()
+    def keep(m) :
+        name = _SPECIAL.format(len(specials))
+        specials[name] = m.group(2)
+        return m.group(1) + name
+    if "<" in code and ">" in code :
+        code = _x_special.sub(keep,code)
+    lines = io.StringIO(code).readlines()
+    offsets = [0]
+    for ln in lines :
+        offsets.append(offsets[-1] + len(ln))
+    def at(rc) :
+        return offsets[rc[0]-1] + rc[1]
+    try :
+        toks = [t for t in tokenize.generate_tokens(io.StringIO(code).readline)
+                if t.type not in (tokenize.NL,tokenize.COMMENT,tokenize.INDENT,tokenize.DEDENT,tokenize.NEWLINE,tokenize.ENDMARKER)]
+    except (tokenize.TokenError,IndentationError,SyntaxError) as e :
+        raise QueryError(str(e))
+    edits = list()
+    braces = list()
+    for i,t in enumerate(toks) :
+        prev = toks[i-1] if i > 0 else None
+        if t.type == tokenize.ERRORTOKEN and t.string.strip() :
+            raise QueryError("unexpected '{}'".format(t.string))
+        if t.string == "{" :
+            choice = prev is not None and prev.string == "."
+            braces.append(choice)
+            if choice :
+                edits.append((at(t.start),at(t.end),_CHOICE + "("))
+        elif t.string == "}" :
+            if braces and braces.pop() :
+                edits.append((at(t.start),at(t.end),")"))
+        elif t.string == "+" and prev is not None and prev.string == "." and i+1 < len(toks) and toks[i+1].type == tokenize.NAME :
+            edits.append((at(prev.end),at(toks[i+1].start),_ATTR))
+        elif t.string == "]" and prev is not None and prev.string == "[" and i > 1 :
+            before = toks[i-2]
+            if before.string in [")","]","}"] or before.type == tokenize.STRING \
+               or (before.type == tokenize.NAME and not keyword.iskeyword(before.string)) :
+                edits.append((at(t.start),at(t.start),_ALL))
+    for start,end,s in reversed(edits) :
+        code = code[:start] + s + code[end:]
+    return code, specials
+
+
+class QueryCompiler(ast.NodeTransformer) :
+    def __init__(self, keydt=None, ns=None, specials=None, notify=None) :
+        self.__keydt = keydt or dict()
+        self.__ns = ns or dict()
+        self.__specials = specials or dict()
+        self.__notify = notify
+        self.__locals = set()
+        self.__statics = set()
+        self.__nvar = 0
+
+    def compile(self, tree) :
+        for node in ast.walk(tree) :
+            if isinstance(node,ast.Name) and not isinstance(node.ctx,ast.Load) :
+                self.__locals.add(node.id)
+            elif isinstance(node,ast.arg) :
+                self.__locals.add(node.arg)
+            elif isinstance(node,ast.alias) :
+                self.__statics.add((node.asname or node.name).split(".")[0])
+            elif isinstance(node,(ast.FunctionDef,ast.ClassDef)) :
+                self.__statics.add(node.name)
+        tree = self.visit(tree)
+        return ast.fix_missing_locations(tree)
+
+    def __newvar(self) :
+        self.__nvar += 1
+        return "_qic{}".format(self.__nvar)
+
+    def __static(self, node) :
+        if isinstance(node,ast.Name) :
+            if node.id == "_" :
+                return False
+            if node.id in self.__locals :
+                return node.id in self.__statics
+            return node.id in self.__statics or node.id in self.__ns or hasattr(builtins,node.id)
+        if isinstance(node,ast.Attribute) :
+            return self.__static(node.value)
+        return False
+
+    def __key(self, name) :
+        if name in self.__specials :
+            return self.__specials[name]
+        spellings = self.__keydt.get(name.lower())
+        if spellings and len(spellings) == 1 :
+            key = next(iter(spellings))
+            if self.__notify and key != name :
+                self.__notify(name,key)
+            return key
+        if spellings and name in spellings :
+            return name
+        return name.lower()
+
+    def __get(self, value, name) :
+        return ast.Call(func=ast.Attribute(value=value,attr="get",ctx=ast.Load()),
+                        args=[ast.Constant(value=self.__key(name)),ast.Constant(value="")],keywords=[])
+
+    def __apply(self, base, fn) :
+        if isinstance(base,Mapped) :
+            return base.apply(fn)
+        return fn(base)
+
+    def __path(self, node) :
+        if isinstance(node,ast.Name) :
+            return [node.id]
+        if isinstance(node,ast.Attribute) :
+            return self.__path(node.value) + [node.attr]
+        raise QueryError("unsupported key in choice: {}".format(ast.dump(node)))
+
+    def __choice(self, base, args) :
+        paths = [self.__path(a) for a in args]
+        def fn(elt) :
+            keys, values = list(), list()
+            for p in paths :
+                v = elt
+                for w in p :
+                    v = self.__get(v,w)
+                keys.append(ast.Constant(value=".".join([self.__specials.get(w,w) for w in p])))
+                values.append(v)
+            return ast.Dict(keys=keys,values=values)
+        return self.__apply(base,fn)
+
+    def __materialize(self, res) :
+        return res.materialize() if isinstance(res,Mapped) else res
+
+    def __chain(self, node) :
+        if isinstance(node,ast.Attribute) and isinstance(node.ctx,ast.Load) :
+            if node.attr == _CHOICE :
+                raise QueryError("choice .{} must list keys")
+            if node.attr.startswith(_ATTR) :
+                attr = node.attr[len(_ATTR):]
+                return self.__apply(self.__chain(node.value),lambda e : ast.Attribute(value=e,attr=attr,ctx=ast.Load()))
+            if self.__static(node) :
+                return node
+            return self.__apply(self.__chain(node.value),lambda e : self.__get(e,node.attr))
+        if isinstance(node,ast.Subscript) and isinstance(node.ctx,ast.Load) :
+            base = self.__chain(node.value)
+            sl = node.slice
+            if isinstance(sl,ast.Name) and sl.id == _ALL :
+                return self.__apply(base,lambda e : Mapped(self.__newvar(),e))
+            if isinstance(sl,ast.Slice) :
+                sl = self.visit(sl)
+                return self.__apply(base,lambda e : Mapped(self.__newvar(),ast.Subscript(value=e,slice=sl,ctx=ast.Load()),sliced=True))
+            sl = self.visit(sl)
+            fn = lambda e : ast.Subscript(value=e,slice=sl,ctx=ast.Load())
+            if isinstance(base,Mapped) :
+                return fn(base.iter) if base.sliced else base.index(fn)
+            return fn(base)
+        if isinstance(node,ast.Call) and isinstance(node.func,ast.Attribute) :
+            func = node.func
+            if func.attr == _CHOICE :
+                if node.keywords :
+                    raise QueryError("choice .{} must list keys")
+                return self.__choice(self.__chain(func.value),node.args)
+            args = [self.visit(a) for a in node.args]
+            keywords = [self.visit(k) for k in node.keywords]
+            if self.__static(func) :
+                return ast.Call(func=func,args=args,keywords=keywords)
+            attr = func.attr[len(_ATTR):] if func.attr.startswith(_ATTR) else func.attr
+            return self.__apply(self.__chain(func.value),
+                                lambda e : ast.Call(func=ast.Attribute(value=e,attr=attr,ctx=ast.Load()),args=args,keywords=keywords))
+        if isinstance(node,ast.Name) :
+            return self.visit_Name(node)
+        return self.generic_visit(node)
+
+    def visit_Attribute(self, node) :
+        return self.__materialize(self.__chain(node))
+
+    def visit_Subscript(self, node) :
+        return self.__materialize(self.__chain(node))
+
+    def visit_Call(self, node) :
+        return self.__materialize(self.__chain(node))
+
+    def visit_Name(self, node) :
+        if node.id == _ALL or node.id == _CHOICE :
+            raise QueryError("unexpected []")
+        if node.id in self.__specials :
+            return ast.Constant(value=self.__specials[node.id])
+        return node
+
+
+def key_words(code) :
+    # the lowercase words of code that may name keys, none when it has no
+    # .key at all. more than needed is fine, these only pick what to look up.
+    if not _x_dotted.search(code) :
+        return set()
+    return set([w.lower() for w in _x_word.findall(code)])
+
+
+def expand_query(code, keydt=None, ns=None, notify=None) :
+    # one pass from qic syntax to python source, no evaluation involved.
+    # raises QueryError when the code is outside what the compiler handles.
+    if not hasattr(ast,"unparse") :
+        raise QueryError("python 3.9+ is needed")
+    xcode, specials = _lex(code)
+    try :
+        tree = ast.parse(xcode,mode="exec")
+    except SyntaxError as e :
+        raise QueryError(str(e))
+    tree = QueryCompiler(keydt,ns,specials,notify).compile(tree)
+    return ast.unparse(tree)
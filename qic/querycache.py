@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import sys
+import os
+import re
+import json
+import marshal
+import hashlib
+from collections import OrderedDict
+
+# bump when expansion changes so entries written by older versions are
+# not picked up
+FORMAT = 2
+
+
+class CompiledQuery :
+    __slots__ = ("code","evalobj","execobj")
+
+    def __init__(self, code, evalobj=None, execobj=None) :
+        self.code = code
+        self.evalobj = evalobj
+        self.execobj = execobj
+
+    @classmethod
+    def build(cls, code, evaluable=True) :
+        evalobj = execobj = None
+        if evaluable :
+            try :
+                evalobj = compile(code,"<string>","eval")
+            except SyntaxError :
+                pass
+        try :
+            execobj = compile(code,"<string>","exec")
+        except SyntaxError :
+            pass
+        return cls(code,evalobj,execobj)
+
+
+class QueryCache :
+    def __init__(self, maxsize=512, cachedir=None) :
+        self.__maxsize = maxsize
+        self.__mem = OrderedDict()
+        self.__dir = cachedir
+        if self.__dir :
+            try :
+                os.makedirs(self.__dir,exist_ok=True)
+            except OSError :
+                self.__dir = None
+
+    @staticmethod
+    def default_dir() :
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"),".cache")
+        return os.path.join(base,"qic",sys.implementation.cache_tag or "python")
+
+    @staticmethod
+    def makekey(code, keydt, *extra) :
+        # expansion only looks up the words used in the code, so only their
+        # spellings need to be part of the fingerprint.
+        words = sorted(set(w.lower() for w in re.findall(r"\w+",code)))
+        fp = [[w,sorted(keydt[w])] for w in words if w in keydt]
+        raw = json.dumps([FORMAT,code,fp,[str(x) for x in extra]])
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def __path(self, key) :
+        return os.path.join(self.__dir,key + ".qc")
+
+    def get(self, key) :
+        if key in self.__mem :
+            self.__mem.move_to_end(key)
+            return self.__mem[key]
+        if not self.__dir :
+            return None
+        fn = self.__path(key)
+        try :
+            with open(fn,"rb") as f :
+                code, evalobj, execobj = marshal.loads(f.read())
+            os.utime(fn)
+        except (OSError, ValueError, EOFError, TypeError) :
+            return None
+        q = CompiledQuery(code,evalobj,execobj)
+        self.__remember(key,q)
+        return q
+
+    def put(self, key, q) :
+        self.__remember(key,q)
+        if not self.__dir :
+            return
+        fn = self.__path(key)
+        tmp = "{}.{}.tmp".format(fn,os.getpid())
+        try :
+            with open(tmp,"wb") as f :
+                f.write(marshal.dumps((q.code,q.evalobj,q.execobj)))
+            os.replace(tmp,fn)
+            self.__evict()
+        except (OSError, ValueError) :
+            try :
+                os.remove(tmp)
+            except OSError :
+                pass
+
+    def __remember(self, key, q) :
+        self.__mem[key] = q
+        self.__mem.move_to_end(key)
+        while len(self.__mem) > self.__maxsize :
+            self.__mem.popitem(last=False)
+
+    def __evict(self) :
+        files = [os.path.join(self.__dir,f) for f in os.listdir(self.__dir) if f.endswith(".qc")]
+        if len(files) <= self.__maxsize :
+            return
+        files.sort(key=lambda f : os.stat(f).st_mtime)
+        for f in files[:len(files) - self.__maxsize] :
+            try :
+                os.remove(f)
+            except OSError :
+                pass
@@ -3,35 +3,114 @@
 
 import sys
 import argparse
-import os
 import re
 import csv
 import copy
-from wcwidth import wcswidth
+import operator
+from wcwidth import (wcswidth,wcwidth)
 from collections import defaultdict
-from itertools import zip_longest
-from .commandline import commandline
+from itertools import (zip_longest,islice,chain)
+from . import jsoncodec
+from . import yamlcodec
+from . import extsort
+from .columnar import ColumnStore
+from .termcap import supports_color
+
+# display widths of cell text seen before. printable ascii is as wide as it
+# is long and never stored.
+_x_widths = dict()
+
+
+def _wcswidth(s):
+    if s.isascii() and s.isprintable():
+        return len(s)
+    w = _x_widths.get(s)
+    if w is None:
+        if len(_x_widths) >= 2**16:
+            _x_widths.clear()
+        w = _x_widths[s] = wcswidth(s)
+    return w
+
+
+def _cut(ln, maxwidth):
+    # a line wider than maxwidth in pieces, each as long as it can be with no
+    # more than maxwidth characters and columns, cut where the running width
+    # of its characters would pass that
+    if ln.isascii() and ln.isprintable():
+        return [ln[i:i + maxwidth] for i in range(0, len(ln), maxwidth)]
+    result = list()
+    if "\u200d" in ln or "\ufe0f" in ln:
+        # joiners and variation selectors are measured with their neighbours
+        left = ln
+        while left:
+            end = min(maxwidth, len(left))
+            while wcswidth(left[:end]) > maxwidth:
+                end -= 1
+            result.append(left[:end])
+            left = left[end:]
+        return result
+    start = 0
+    total = 0
+    for i, c in enumerate(ln):
+        w = wcwidth(c)
+        if i - start >= maxwidth or total + w > maxwidth:
+            result.append(ln[start:i])
+            start = i
+            total = 0
+        total += w
+    result.append(ln[start:])
+    return result
 
 
 class SimpleTable:
-    def __init__(self, data=None, header=None, cols=None, maxwidth=-1, noheader=False,tree=False,maxrows=2**30):
+    # data is a list of rows, or any iterable of rows when the table is only
+    # rendered: an iterator is read once as lines are written, a re-iterable
+    # (whose iter() gives a fresh iterator) is read twice, once for the
+    # widths. with `sample` the widths come from that many rows only.
+    # with `columnar` the rows are kept in a ColumnStore, as is one passed in.
+    def __init__(self, data=None, header=None, cols=None, maxwidth=-1, noheader=False,tree=False,maxrows=2**30,sample=None,columnar=False):
         self.__maxwidth = int(maxwidth)
         self.__noheader = noheader
         self.__maxrows = maxrows
         self.__tree = tree 
+        self.__sample = sample
+        if columnar and data is not None and not isinstance(data, ColumnStore):
+            data = ColumnStore(data)
+        first = None
+        if data is not None and type(data) is not list and noheader :
+            # the header is the first row, peek at it
+            it = iter(data)
+            first = next(it,None)
+            if first is None :
+                data = list()
+            elif it is data :
+                data = chain([first],it)
         if cols and re.search(",", cols):
             ncols = len(header)
             xmap = [int(i) for i in re.split(r",", cols) if int(i) < ncols]
             self.__header = [header[i] for i in xmap]
-            self.__data = list()
-            for d in data:
-                self.__data.append([d[i] for i in xmap])
+            if type(data) is list :
+                self.__data = list()
+                for d in data:
+                    self.__data.append([d[i] for i in xmap])
+            elif isinstance(data, ColumnStore) :
+                self.__data = data.select(xmap)
+            else :
+                self.__data = _rows(data,lambda d : [d[i] for i in xmap])
         else:
             self.__header = header or list()
             self.__data = data or list()
-            if self.__noheader and len(self.__data) > 0 :
+            if self.__noheader and type(self.__data) is list and len(self.__data) > 0 :
                 self.__header = self.__data[0]
-        self.__data = self.__data[:self.__maxrows]
+            elif self.__noheader and first is not None :
+                self.__header = list(first)
+        if type(self.__data) is list :
+            self.__data = self.__data[:self.__maxrows]
+        elif isinstance(self.__data, ColumnStore) :
+            if len(self.__data) > self.__maxrows :
+                self.__data = self.__data[:self.__maxrows]
+        elif self.__maxrows < 2**30 :
+            self.__data = _rows(self.__data,maxrows=self.__maxrows)
         self.__num_of_cols = len(self.__header)
 
     def import_csv(self, csvfile, header=True):
@@ -54,24 +133,22 @@ class SimpleTable:
         self.__data += other.__data
 
     def get_json(self):
-        import json
         tbl = list()
         for r in self.__data:
             row = dict()
             for ix, val in enumerate(r):
                 row[self.__header[ix]] = val
             tbl.append(row)
-        return json.dumps(tbl, indent=2)
+        return jsoncodec.dumps(tbl, indent=2)
 
     def get_yaml(self):
-        import yaml
         tbl = list()
         for r in self.__data:
             row = dict()
             for ix, val in enumerate(r):
                 row[self.__header[ix]] = val
             tbl.append(row)
-        return yaml.safe_dump(tbl, default_flow_style=False)
+        return yamlcodec.safe_dump(tbl, default_flow_style=False)
 
     def get_csv(self):
         import io
@@ -113,31 +190,32 @@ class SimpleTable:
         return res
 
     def __wcswidth_x(self, s):
+        if s.isascii() and s.isprintable():
+            return len(s)
         res = 0
         for ln in s.splitlines():
-            wclen = wcswidth(ln)
+            wclen = _wcswidth(ln)
             if wclen > res:
                 res = wclen
         return res
 
     def __splitstring(self, s, maxwidth):
+        if len(s) <= maxwidth and s.isascii() and s.isprintable():
+            return [s] if s else []
         result = list()
         for ln in s.splitlines():
-            if wcswidth(ln) <= maxwidth:
+            if _wcswidth(ln) <= maxwidth:
                 result.append(ln)
             else:
-                left = ln
-                while left:
-                    start = 0
-                    end = min(maxwidth, len(left))
-                    while wcswidth(left[start:end]) > maxwidth:
-                        end -= 1
-                    result.append(left[start:end])
-                    left = left[end:]
+                result.extend(_cut(ln, maxwidth))
         return result
 
     def __splitrow(self, row):
         if self.__maxwidth < 20:
+            line = "".join(row)
+            if line.isascii() and line.isprintable():
+                # one line, or none when every cell is empty
+                return [row] if line else []
             return zip_longest(*[c.splitlines() for c in row], fillvalue="")
         else:
             return zip_longest(
@@ -145,9 +223,9 @@ class SimpleTable:
                 fillvalue=""
             )
 
-    def __repr__(self):
+    def __widths(self, rows):
         width = [0 for _ in range(len(self.__header))]
-        for row in self.__data + [self.__header]:
+        for row in chain(rows, [self.__header]):
             for ix, col in enumerate(row):
                 if not col :
                     if col == 0 :
@@ -161,19 +239,26 @@ class SimpleTable:
                     width[ix] = wclen
         if self.__maxwidth >= 20:
             width = [min(w, self.__maxwidth) for w in width]
+        return width
+
+    def iter_lines(self):
+        # the rendered lines, without line ends, one at a time
+        rows = self.__data
+        if self.__sample is not None :
+            it = iter(rows)
+            head = list(islice(it,self.__sample))
+            width = self.__widths(head)
+            rows = chain(head,it)
+        elif type(rows) is list or iter(rows) is not rows :
+            width = self.__widths(rows)
+        else :
+            rows = list(rows)
+            width = self.__widths(rows)
         twidth = copy.copy(width)
         for ix, w in enumerate(twidth):
             twidth[ix] = (
-                w - wcswidth(str(self.__header[ix])) + len(str(self.__header[ix]))
+                w - _wcswidth(str(self.__header[ix])) + len(str(self.__header[ix]))
             )
-        def supports_color():
-            plat = sys.platform
-            supported_platform = plat != 'Pocket PC' and (plat != 'win32' or 'ANSICON' in os.environ)
-            is_a_tty = hasattr(sys.stdout, 'isatty') and sys.stdout.isatty()
-            m = re.search(r"^xterm",os.environ.get("TERM","n/a"),re.IGNORECASE)
-            ret,out,err = commandline.qx("uname -s")
-            iscygwin = re.search(r"cygwin",out,re.IGNORECASE)
-            return (is_a_tty or iscygwin) and (m or supported_platform)
         class bcolors:
             HEADER = '\033[95m'
             OKBLUE = '\033[94m'
@@ -185,16 +270,15 @@ class SimpleTable:
             BOLD = '\033[1m'
             UNDERLINE = '\033[4m'
         fmtstr = "".join(["{:" + str(l + 1) + "}" for l in twidth])
-        res = ""
         if not self.__noheader:
             if supports_color() :
-                res += bcolors.BOLD + fmtstr.format(*self.__header).rstrip() + bcolors.ENDC + "\n"
-                res += ("-" * (sum(width) + len(width) - 1)) + "\n"
+                yield bcolors.BOLD + fmtstr.format(*self.__header).rstrip() + bcolors.ENDC
+                yield "-" * (sum(width) + len(width) - 1)
             else :
-                res += fmtstr.format(*self.__header).rstrip() + "\n"
-                res += ("-" * (sum(width) + len(width) - 1)) + "\n"
+                yield fmtstr.format(*self.__header).rstrip()
+                yield "-" * (sum(width) + len(width) - 1)
         oldrow = None
-        for ix,r in enumerate(self.__data):
+        for ix,r in enumerate(rows):
             if ix == 0 :
                 row = [str(c) if c or c==0 else "" for c in r]
                 oldrow = r
@@ -213,28 +297,71 @@ class SimpleTable:
             if len(row) < len(width):
                 row.extend([""] * (len(width) - len(row)))
             for t in self.__splitrow(row):
-                twidth = copy.copy(width)
-                for ix, w in enumerate(twidth):
-                    twidth[ix] = w - wcswidth(str(t[ix])) + len(str(t[ix]))
-                fmtstr = "".join(["{:" + str(l + 1) + "}" for l in twidth])
-                res += fmtstr.format(*t).rstrip() + "\n"
-        return res
+                # each cell padded to its column, by display width
+                yield "".join([c + " " * (max(w - _wcswidth(c),0) + 1) for c, w in zip(t, width)]).rstrip()
+
+    def write(self, fp=None):
+        fp = fp or sys.stdout
+        for ln in self.iter_lines() :
+            fp.write(ln + "\n")
+
+    def __repr__(self):
+        return "".join([ln + "\n" for ln in self.iter_lines()])
+
+
+class _Rows:
+    # rows of a re-iterable, mapped and cut short, iterable again as well
+    def __init__(self, rows, func=None, maxrows=2**30):
+        self.__rows = rows
+        self.__func = func
+        self.__maxrows = maxrows
+
+    def __iter__(self):
+        rows = islice(self.__rows,self.__maxrows)
+        return map(self.__func,rows) if self.__func else rows
+
+
+def _rows(rows, func=None, maxrows=2**30):
+    # a one-shot source stays one-shot
+    if iter(rows) is rows :
+        rows = islice(rows,maxrows)
+        return map(func,rows) if func else rows
+    return _Rows(rows,func,maxrows)
 
 
 def tokenize(s):
-    offset = 0
-    tokens = list()
-    while True:
-        m = re.search(r"\S+\s*", s[offset:])
-        if m:
-            tokens.append([offset + m.start(), offset + m.end(), m.group().rstrip()])
-            offset += m.end()
-        else:
-            break
+    tokens = [[m.start(), m.end(), m.group().rstrip()] for m in re.finditer(r"\S+\s*", s)]
     tokens[-1][1] = -1
     return tokens
 
 
+def _splitter(sepchar):
+    # what re.split(sepchar, ln.rstrip()) does to a line, picked once. the
+    # default \s+ and a single literal character go by str.split.
+    if sepchar == r"\s+":
+        def split(ln):
+            arr = ln.split()
+            if ln[:1].isspace():
+                arr.insert(0, "")
+            return arr
+        return split
+    c = {r"\t": "\t", r"\s": None}.get(sepchar, sepchar)
+    if c and len(c) == 2 and c[0] == "\\" and not c[1].isalnum():
+        c = c[1]
+    if c and len(c) == 1 and c not in ".^$*+?{}[]\\|()":
+        return lambda ln: ln.rstrip().split(c)
+    pattern = re.compile(r"{}".format(sepchar))
+    return lambda ln: pattern.split(ln.rstrip())
+
+
+def _slicer(xheader):
+    # the fixed width columns under a tokenized header, cut in one call
+    getter = operator.itemgetter(*[slice(s, t) for (s, t, v) in xheader])
+    if len(xheader) == 1:
+        return lambda ln: [getter(ln).rstrip()]
+    return lambda ln: [c.rstrip() for c in getter(ln)]
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -311,6 +438,38 @@ def main():
         default=False,
         help="indicate there's no header",
     )
+    parser.add_argument(
+        "--sample",
+        dest="sample",
+        type=int,
+        help="size column widths from the first N rows and print the rest as they come.",
+    )
+    parser.add_argument(
+        "--top",
+        dest="top",
+        type=int,
+        help="only the N biggest rows by -s, biggest first. without -s the first N rows.",
+    )
+    parser.add_argument(
+        "--bottom",
+        dest="bottom",
+        type=int,
+        help="only the N smallest rows by -s, smallest first. without -s the last N rows.",
+    )
+    parser.add_argument(
+        "--sort-mem",
+        dest="sortmem",
+        type=int,
+        default=256,
+        help="MB of rows sorted in memory with -s, beyond that sorted runs go to temporary files. default 256.",
+    )
+    parser.add_argument(
+        "--columnar",
+        dest="columnar",
+        action="store_true",
+        default=False,
+        help="keep rows column by column, repeated values once. for big inputs to sort or convert.",
+    )
     parser.add_argument(
         "-X",
         "--debug",
@@ -343,61 +502,86 @@ def main():
         else:
             xheader = tokenize(mhdr)
             header = [v.rstrip() for (s, t, v) in xheader]
-    data = list()
-    lno = 0
-    INPUT = sys.stdin
-    if args.infile:
-        with open(args.infile, "r") as f:
-            INPUT = f.readlines()
-    for ln in INPUT:
-        if not ln or not re.search(r"\S+", ln):
-            continue
-        if not header:
-            for c, nc in colsdict.items():
-                ln = re.sub(c, nc, ln)
-        if not args.table:
-            arr = re.split(r"{}".format(args.sepchar), ln.rstrip())
-        else:
-            if xheader:
-                arr = [ln[s:t].rstrip() for (s, t, v) in xheader]
-            else:
-                for c, nc in colsdict.items():
-                    ln = re.sub(c, nc, ln)
-                xheader = tokenize(ln)
-                if args.lineno:
-                    header = ["#"] + [v.rstrip() for (s, t, v) in xheader]
-                else:
-                    header = [v.rstrip() for (s, t, v) in xheader]
+    given, xgiven = list(header), xheader
+    split = _splitter(args.sepchar)
+    renames = [(re.compile(c), nc) for c, nc in colsdict.items()]
+
+    def rows(lines):
+        # the rows of one pass over the input, the header is picked up on
+        # the way when not given and left in `header`
+        hdr, xhdr = list(given), xgiven
+        cut = _slicer(xhdr) if xhdr else None
+        lno = 0
+        for ln in lines:
+            if not ln or ln.isspace():
                 continue
-        if len(header) == 0 or (args.lineno and len(header) == 1):
+            if not hdr:
+                for c, nc in renames:
+                    ln = c.sub(nc, ln)
             if not args.table:
-                header.extend(arr)
-        else:
-            lno += 1
-            if args.lineno:
-                data.append([str(lno)] + arr)
+                arr = split(ln)
+            else:
+                if cut:
+                    arr = cut(ln)
+                else:
+                    for c, nc in renames:
+                        ln = c.sub(nc, ln)
+                    xhdr = tokenize(ln)
+                    cut = _slicer(xhdr)
+                    if args.lineno:
+                        hdr = ["#"] + [v.rstrip() for (s, t, v) in xhdr]
+                    else:
+                        hdr = [v.rstrip() for (s, t, v) in xhdr]
+                    header[:] = hdr
+                    continue
+            if len(hdr) == 0 or (args.lineno and len(hdr) == 1):
+                if not args.table:
+                    hdr.extend(arr)
+                    header[:] = hdr
             else:
-                data.append(arr)
+                lno += 1
+                if args.lineno:
+                    yield [str(lno)] + arr
+                else:
+                    yield arr
+
+    class Reread:
+        # the input file read again on every pass, nothing kept in between
+        def __iter__(self):
+            with open(args.infile, "r") as f:
+                yield from rows(f)
+
+    streaming = not (args.sortby or args.pivot or args.format or args.dataonly)
+    if args.infile:
+        data = Reread()
+        # the first row tells the header
+        next(iter(data), None)
+    else:
+        data = rows(sys.stdin)
+        first = next(data, None)
+        data = list() if first is None else chain([first], data)
     oheader = list()
     for h in header:
         nh = colsdict_revert.get(h, h)
         oheader.append(nh)
     if args.dataonly:
-        data = [oheader] + data
+        data = chain([oheader], data)
+    fsort = None
     if args.sortby:
-
-        def fsort(x):
-            v = list()
-            for i in re.split(r",", args.sortby):
-                v0 = x[int(i)] or ""
-                if re.match(r"^\d+(\.\d*)*$", v0):
-                    v.append(float(v0))
-                else:
-                    v.append(0)
-                v.append(v0)
-            return v
-
-        data = sorted(data, key=fsort)
+        fsort = extsort.numeric_key([int(i) for i in re.split(r",", args.sortby)])
+    if args.top is not None:
+        data = extsort.top(data, args.top, fsort)
+    elif args.bottom is not None:
+        data = extsort.bottom(data, args.bottom, fsort)
+    elif args.sortby:
+        if args.columnar:
+            data = ColumnStore(data)
+            data.sort(key=fsort)
+        else:
+            # past --sort-mem the rows are sorted in runs on disk
+            data = extsort.sort(data, key=fsort, limit=args.sortmem * 2**20)
+    elif not streaming or (not args.infile and args.sample is None):
+        data = ColumnStore(data) if args.columnar else list(data)
     if args.pivot:
         print(SimpleTable(header=oheader, data=data, cols=args.dumpcols).repr_pivot())
     else:
@@ -408,6 +592,7 @@ def main():
             maxwidth=args.maxwidth,
             noheader=args.dataonly,
             tree=args.tree,
+            sample=args.sample,
         )
         if args.format == "json":
             print(t.get_json(), end="")
@@ -418,7 +603,7 @@ def main():
         elif args.format == "html":
             print(t.get_html(), end="")
         else:
-            print(t, end="")
+            t.write(sys.stdout)
 
 
 if __name__ == "__main__":
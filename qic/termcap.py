@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import sys
+import os
+import re
+import platform
+
+_x_probe = dict()
+
+def _terminal() :
+    # what the platform and TERM allow, probed once per process
+    if "terminal" not in _x_probe :
+        plat = sys.platform
+        supported_platform = plat != 'Pocket PC' and (plat != 'win32' or 'ANSICON' in os.environ)
+        m = re.search(r"^xterm",os.environ.get("TERM","n/a"),re.IGNORECASE)
+        try :
+            system = platform.system()
+        except Exception :
+            system = ""
+        iscygwin = plat == "cygwin" or re.search(r"cygwin",system,re.IGNORECASE) is not None
+        _x_probe["terminal"] = (bool(m or supported_platform),iscygwin)
+    return _x_probe["terminal"]
+
+def _isatty(stream) :
+    key = ("tty",id(stream))
+    if key not in _x_probe :
+        try :
+            _x_probe[key] = stream.isatty()
+        except (AttributeError,ValueError) :
+            _x_probe[key] = False
+    return _x_probe[key]
+
+def forced() :
+    return os.environ.get("force_ansicolor","") in ["true","yes","y","1"]
+
+def supports_color(stream=None) :
+    if forced() :
+        return True
+    if os.environ.get("NO_COLOR","") :
+        return False
+    capable, iscygwin = _terminal()
+    return (_isatty(stream or sys.stdout) or iscygwin) and capable
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+import yaml
+
+# the libyaml classes behave like the python ones, only much faster.
+try :
+    from yaml import (CSafeLoader as SafeLoader, CSafeDumper as SafeDumper, CDumper as Dumper)
+    libyaml = True
+except ImportError :
+    from yaml import (SafeLoader, SafeDumper, Dumper)
+    libyaml = False
+
+def safe_load(stream) :
+    return yaml.load(stream,Loader=SafeLoader)
+
+class _LineStream :
+    # lets the loaders read from any iterable of lines
+    def __init__(self, lines) :
+        self.__lines = iter(lines)
+
+    def read(self, size=-1) :
+        return next(self.__lines,"")
+
+def safe_load_all(stream) :
+    # documents are parsed one at a time as the stream is read
+    if not (type(stream) is str or hasattr(stream,"read")) :
+        stream = _LineStream(stream)
+    return yaml.load_all(stream,Loader=SafeLoader)
+
+def dump(ds, **kwargs) :
+    return yaml.dump(ds,Dumper=Dumper,**kwargs)
+
+def safe_dump(ds, **kwargs) :
+    return yaml.dump(ds,Dumper=SafeDumper,**kwargs)
@@ -21,7 +21,7 @@ setup(
     classifiers=["License :: OSI Approved :: Apache Software License"],
     packages=find_packages(),
     include_package_data=True,
-    install_requires=[ "wcwidth", "pyyaml", "pygments", "prompt_toolkit","json_to_html" ],
+    install_requires=[ "wcwidth", "pyyaml", "pygments", "prompt_toolkit" ],
     keywords=[ "json","yaml","xml","query","jq", "dq", "dsq", "dsquery","qic", "dataquery", "json query", "xml query", "yaml query", "jello", "jq", ],
     entry_points={ "console_scripts": 
         [ 
@@ -152,3 +152,14 @@ set +x; sleep $interval;
 
 
 
+
+eval "$clearscr";title="stream JSON lines, code runs per record"
+echo $nnn; (( nnn = nnn + 1 )) ;   echo $title;  sleep $titletime; set -x; 
+printf '{"userId":1,"firstName":"Krish"}\n{"userId":2,"firstName":"racks"}{"userId":3,"firstName":"denial"}\n' | python -mqic --lines "_.{firstname,userid}" -c
+set +x; sleep $interval;
+
+
+eval "$clearscr";title="evaluate JSON lines in 2 processes, _j/_y/_h results come back from the workers"
+echo $nnn; (( nnn = nnn + 1 )) ;   echo $title;  sleep $titletime; set -x; 
+printf '{"id":1,"name":"a"}\n{"id":2,"name":"b"}\n{"id":3,"name":"c"}\n' | python -mqic --lines -j 2 "_j(_) if _.id == 3 else None"
+set +x; sleep $interval;
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# Yonghang Wang
+
+# the ast compiler against the regex chain it replaced: each query is run
+# through qic once as it is and once with expand_query refusing it, which
+# sends it to legacy_expand, and both have to print the same.
+#
+#   python -m unittest discover -s test    (or pytest)
+
+import io
+import os
+import sys
+import unittest
+import contextlib
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qic.dsq as dsq
+from qic.qcompile import (expand_query,QueryError)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (data file, query) from the README and test_non_interactive.sh
+QUERIES = [
+    ("s1.json","_[0]"),
+    ("s1.json","_[]"),
+    ("s1.json","_[0]._id"),
+    ("s1.json","_[0].product_name"),
+    ("s1.json","[ _[0].product_name ]"),
+    ("s1.json","_[]._id"),
+    ("s1.json","_[0].{_id,quantity}"),
+    ("s1.json","_[0].{product_name, quantity, unit_cost}"),
+    ("s1.json","_[].{_id,quantity}"),
+    ("s1.json","_[].{quantity,_id.<$oid>}"),
+    ("s1.json","_[]._id.<$oid>"),
+    ("s1.json","_[0].keys()"),
+    ("s2.json","_.colors[].code.hex"),
+    ("s2.json","_.colors[0].code.rgba[1:]"),
+    ("s3.json","_.items[].{kind,id.kind}"),
+    ("s4.json","_[0].user.{name,screen_name}"),
+    ("s5.json","_.batters.batter + _.topping"),
+    ("s6.json","_.users[0].userid"),
+    ("s6.json","_.users[].firstname"),
+    ("s6.json","_.users[:2]"),
+    ("s6.json","_.users[-1].{firstname,lastname}"),
+    ("s6.json","_.users[1: 2   ].{firstname,lastname}"),
+    ("s6.json","_.users[1:3].{firstname,lastname}"),
+    ("s6.json","_.users[1:].{firstname,lastname}"),
+    ("s6.json","_.users[:3].{firstname,lastname}"),
+    ("s6.json","_.users[:].{firstname,lastname}"),
+    ("s6.json","_.users[1:3][0].firstname"),
+    ("s6.json","_.users[0].firstname.upper()"),
+    ("s6.json","_.users[0].+keys()"),
+    ("s6.json","_.users[0].firstname.+upper()"),
+    ("s6.json","len(_.users)"),
+    ("s6.json","x = _.users[0]\\nprint(x.firstname)"),
+    ("s6.json","for u in _.users :\\n    print(u.firstname)"),
+    ("s6.json","[u.firstname for u in _.users]"),
+    ("s6.json","list(map(lambda u : u.get('firstName'), _.users))"),
+    ("s6.json","sorted(_.users, key=lambda u : u['userId'])[0].firstname"),
+]
+
+
+def qic(*argv, legacy=False) :
+    out = io.StringIO()
+    saved = sys.argv, dsq.expand_query
+    sys.argv = ["qic","--no-cache","-p"] + list(argv)
+    if legacy :
+        def refuse(*args, **kwargs) :
+            raise QueryError("legacy")
+        dsq.expand_query = refuse
+    try :
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()) :
+            try :
+                dsq.dsq_main()
+            except SystemExit :
+                pass
+    finally :
+        sys.argv, dsq.expand_query = saved
+    return out.getvalue()
+
+
+class TestAgainstLegacy(unittest.TestCase) :
+    def test_queries(self) :
+        for fname, code in QUERIES :
+            with self.subTest(code=code) :
+                path = os.path.join(HERE,fname)
+                res = qic("-f",path,code)
+                self.assertTrue(res.strip())
+                self.assertEqual(res,qic("-f",path,code,legacy=True))
+
+
+class TestExpandQuery(unittest.TestCase) :
+    def test_keys(self) :
+        keydt = {"firstname":{"firstName"},"userid":{"userId"}}
+        self.assertEqual(expand_query("_.users[0].firstname",keydt),
+                         "_.get('users', '')[0].get('firstName', '')")
+
+    def test_index_after_slice(self) :
+        self.assertEqual(expand_query("_.a[1:3][0].b"),"_.get('a', '')[1:3][0].get('b', '')")
+
+    def test_unsupported(self) :
+        with self.assertRaises(QueryError) :
+            expand_query("_.a[")
+
+
+if __name__ == "__main__" :
+    unittest.main()